@@ -1,5 +1,7 @@
 import datetime
 import json
+import logging
+import zoneinfo
 from enum import StrEnum
 
 from pydantic import BaseModel
@@ -16,17 +18,25 @@ from telegram.ext import (
     Application,
 )
 
+from src.cache import cache
 from src.clients.manga import MangaUpdatesClient
-from src.clients.shikimori import send_shikimori
+from src.clients.rate_limit import close_rate_limiters
+from src.clients.registry import clients
+from src.clients.shikimori import ANIME_SEARCH_CARD_QUERY, shikimori_client
 from src.config import Config
 from src.db import models, enums
 from src.db.utils import init_db
+from src.notifications import photos
+from src.notifications.digest import is_digest_enabled
 
 WAITING_FOR_TEXT = 1
 WAITING_FOR_APPROVE = 2
 
+ANIME_SEARCH_LIMIT = 6
+
+log = logging.getLogger(__name__)
+
 Session = init_db()
-manga_client = MangaUpdatesClient()
 
 
 class Anime(BaseModel):
@@ -65,7 +75,22 @@ async def handle_text_anime(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     animes = []
 
-    shikimori_response = await send_shikimori(text=user_text, limit=6)
+    # Одинаковые запросы с разным регистром и пробелами берутся из одного кеша
+    search_text = ' '.join(user_text.lower().split())
+    shikimori_response = await cache.get_or_compute(
+        key=f'shikimori:animes:{ANIME_SEARCH_LIMIT}:{search_text}',
+        factory=lambda: shikimori_client.get_animes(
+            query=ANIME_SEARCH_CARD_QUERY, text=search_text, limit=ANIME_SEARCH_LIMIT
+        ),
+        ttl=Config.SEARCH_CACHE_TTL,
+    )
+    log.debug(
+        'Cache l1 hits=%s misses=%s, l2 hits=%s misses=%s',
+        cache.l1.hits,
+        cache.l1.misses,
+        cache.l2_hits,
+        cache.l2_misses,
+    )
 
     if not shikimori_response['animes']:
         await update.message.reply_text(
@@ -115,7 +140,9 @@ async def handle_text_anime(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_text_manga(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_text = update.message.text
 
-    search_response = await manga_client.search_series(search_text=user_text)
+    search_response = await clients.get(MangaUpdatesClient).search_series(
+        search_text=user_text
+    )
 
     if not search_response.results:
         await update.message.reply_text(
@@ -286,8 +313,10 @@ async def subscriptions_anime(update: Update, context: ContextTypes.DEFAULT_TYPE
             reply_markup = InlineKeyboardMarkup(keyboard)
             anime = await models.Anime.get(session=session, id=subscription.anime_id)
 
-            await update.message.reply_photo(
-                photo=anime.image_url,
+            await photos.reply_photo(
+                message=update.message,
+                session=session,
+                entity=anime,
                 caption=f'Название: {anime.name}\nСсылка на сайт: {anime.site_url}',
                 reply_markup=reply_markup,
             )
@@ -323,8 +352,10 @@ async def subscriptions_manga(update: Update, context: ContextTypes.DEFAULT_TYPE
                 session=session, id=subscription.manga_id
             )
 
-            await update.message.reply_photo(
-                photo=manga.image_url,
+            await photos.reply_photo(
+                message=update.message,
+                session=session,
+                entity=manga,
                 caption=f'Название: {manga.name}\nСсылка на сайт: {manga.site_url}',
                 reply_markup=reply_markup,
             )
@@ -376,7 +407,9 @@ async def confirm_manga(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     manga_index = context.chat_data.get('manga_index')
     manga = context.chat_data.get('manga_list')[manga_index]
-    manga = await manga_client.get_series(series_id=manga.record.series_id)
+    manga = await clients.get(MangaUpdatesClient).get_series(
+        series_id=manga.record.series_id
+    )
 
     async with Session() as session:
         user, _ = await models.User.get_or_create(
@@ -410,6 +443,82 @@ async def confirm_manga(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+async def digest(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async with Session() as session:
+        user, _ = await models.User.get_or_create(
+            session=session, telegram_id=str(update.message.from_user.id)
+        )
+        user.digest_enabled = not is_digest_enabled(user.digest_enabled)
+        await session.commit()
+
+    await update.message.reply_text(
+        'Уведомления будут приходить одним сообщением за раз'
+        if user.digest_enabled
+        else 'Уведомления будут приходить отдельно по каждому тайтлу'
+    )
+
+
+async def timezone(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text(
+            'Укажите часовой пояс, например: /timezone Europe/Moscow'
+        )
+        return
+
+    try:
+        zoneinfo.ZoneInfo(context.args[0])
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        await update.message.reply_text('Не получилось найти такой часовой пояс')
+        return
+
+    async with Session() as session:
+        user, _ = await models.User.get_or_create(
+            session=session, telegram_id=str(update.message.from_user.id)
+        )
+        user.timezone = context.args[0]
+        await session.commit()
+
+    await update.message.reply_text(f'Часовой пояс установлен: {context.args[0]}')
+
+
+async def quiet_hours(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text(
+            'Укажите тихие часы, например: /quiet_hours 23:00-09:00 '
+            'или /quiet_hours off, чтобы получать уведомления сразу'
+        )
+        return
+
+    if context.args[0] == 'off':
+        # Пустой интервал - тихих часов нет
+        start = end = datetime.time(0, 0)
+    else:
+        try:
+            start, end = (
+                datetime.time.fromisoformat(value)
+                for value in context.args[0].split('-')
+            )
+        except ValueError:
+            await update.message.reply_text(
+                'Неверный формат, пример: /quiet_hours 23:00-09:00'
+            )
+            return
+
+    async with Session() as session:
+        user, _ = await models.User.get_or_create(
+            session=session, telegram_id=str(update.message.from_user.id)
+        )
+        user.quiet_hours_start = start
+        user.quiet_hours_end = end
+        await session.commit()
+
+    await update.message.reply_text(
+        'Тихие часы выключены'
+        if start == end
+        else f'Уведомления не будут приходить с {start:%H:%M} до {end:%H:%M}'
+    )
+
+
 async def end_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
@@ -422,20 +531,39 @@ async def post_init(app: Application) -> None:
             ('subscribe_manga', 'Подписаться на уведомления по манге'),
             ('subscriptions_anime', 'Посмотреть текущие подписки на аниме'),
             ('subscriptions_manga', 'Посмотреть текущие подписки на мангу'),
+            ('digest', 'Включить/выключить объединение уведомлений'),
+            ('timezone', 'Установить часовой пояс'),
+            ('quiet_hours', 'Установить тихие часы'),
             ('cancel', 'Отменить текущую команду'),
         ]
     )
     await app.bot.set_chat_menu_button()
 
 
+async def post_shutdown(app: Application) -> None:
+    await shikimori_client.close()
+    await clients.close()
+    await cache.close()
+    await close_rate_limiters()
+
+
 def main():
     TOKEN = Config.BOT_TOKEN
 
-    app = ApplicationBuilder().token(TOKEN).post_init(post_init).build()
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     app.add_handler(CommandHandler('start', start))
     app.add_handler(CommandHandler('subscriptions_anime', subscriptions_anime))
     app.add_handler(CommandHandler('subscriptions_manga', subscriptions_manga))
+    app.add_handler(CommandHandler('digest', digest))
+    app.add_handler(CommandHandler('timezone', timezone))
+    app.add_handler(CommandHandler('quiet_hours', quiet_hours))
     app.add_handler(CallbackQueryHandler(unsubscribe, pattern='.*unsubscribe.*'))
 
     subscribe_handler = ConversationHandler(
@@ -3,8 +3,21 @@ import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from src import context
+from src.cache import cache
+from src.clients.rate_limit import close_rate_limiters
+from src.clients.registry import clients
+from src.clients.shikimori import shikimori_client
+from src.config import Config
+from src.db import models, Session
 from src.jobs import tasks
+from src.jobs.scheduler import AiringScheduler
+from src.metrics import registry
+from src.notifications.broadcast import broadcaster
+from src.queues.connection import RabbitmqClient
+from src.queues.topology import build_queues
 
 log = logging.getLogger(__name__)
 
@@ -14,12 +27,31 @@ tasks_list = []
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await broadcaster.start()
+
+    if Config.NOTIFICATION_OUTBOX_ENABLED:
+        context.rabbitmq_client.set(
+            RabbitmqClient.from_params(
+                host=Config.RABBITMQ_HOST,
+                port=Config.RABBITMQ_PORT,
+                login=Config.RABBITMQ_LOGIN,
+                password=Config.RABBITMQ_PASSWORD,
+            )
+        )
+        await build_queues()
+
     log.debug('🔄 Starting background tasks')
 
+    if Config.ANIME_SCHEDULER_ENABLED:
+        anime_task = AiringScheduler(handler=tasks.notify_aired_animes).run()
+    else:
+        anime_task = tasks.check_notifications_anime()
+
     app.state._tasks = [
-        asyncio.create_task(tasks.check_notifications_anime()),
+        asyncio.create_task(anime_task),
         asyncio.create_task(tasks.check_notifications_manga()),
         asyncio.create_task(tasks.get_currency_exchange_rates()),
+        asyncio.create_task(tasks.process_notification_outbox()),
     ]
 
     yield  # run app
@@ -32,11 +64,54 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             log.debug('Task cancelled cleanly')
 
+    await broadcaster.stop()
+    await shikimori_client.close()
+    await clients.close()
+    await cache.close()
+    await close_rate_limiters()
+
+    if Config.NOTIFICATION_OUTBOX_ENABLED:
+        rabbitmq_client: RabbitmqClient = context.rabbitmq_client.get()
+        await rabbitmq_client.stop()
+
 
 # Create app
 app = FastAPI(lifespan=lifespan)
 
 
+@app.get('/job-runs')
+async def job_runs(job_name: str | None = None, limit: int = 20):
+    """Последние запуски задач уведомлений"""
+    async with Session() as session:
+        runs = await models.JobRun.list_recent(
+            session=session, job_name=job_name, limit=min(limit, 100)
+        )
+
+    return [
+        {
+            'id': run.id,
+            'job_name': run.job_name,
+            'started_at': run.started_at,
+            'finished_at': run.finished_at,
+            'duration': (run.finished_at - run.started_at).total_seconds(),
+            'error': run.error,
+            'titles_scanned': run.titles_scanned,
+            'titles_changed': run.titles_changed,
+            'messages_sent': run.messages_sent,
+            'messages_failed': run.messages_failed,
+            'messages_queued': run.messages_queued,
+            'external_calls': run.external_calls,
+            'stages': run.stages,
+        }
+        for run in runs
+    ]
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics():
+    return registry.render()
+
+
 @app.get('/health')
 async def root():
     return {'status': 'Fok'}
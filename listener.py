@@ -5,11 +5,15 @@ from fastapi import FastAPI
 import asyncio
 import json
 import logging
+from uuid import UUID
 
 from aio_pika.abc import AbstractIncomingMessage, AbstractQueue
 
 from src import context
+from src.clients.rate_limit import close_rate_limiters
 from src.config import Config
+from src.notifications import outbox
+from src.notifications.broadcast import broadcaster
 from src.queues.connection import RabbitmqClient
 from src.queues.topology import build_queues
 
@@ -22,6 +26,9 @@ async def consume_message(message: AbstractIncomingMessage):
         try:
             payload = json.loads(message.body)
             log.info('Message body %s', payload)
+
+            if payload.get('type') == outbox.NOTIFICATION_EVENT:
+                await outbox.deliver(outbox_id=UUID(payload['outbox_id']))
         except Exception as e:
             log.info(f'❌ Failed to process message: {e}')
 
@@ -50,12 +57,15 @@ async def run_listener(app: FastAPI):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await broadcaster.start()
     await run_listener(app)
 
     yield  # run app
 
     rabbitmq_client: RabbitmqClient = context.rabbitmq_client.get()
     await rabbitmq_client.stop()
+    await broadcaster.stop()
+    await close_rate_limiters()
 
 
 # Create app
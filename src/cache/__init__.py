@@ -0,0 +1,11 @@
+from src.cache.backends import RedisBackend
+from src.cache.memory import MISSING, TTLCache
+from src.cache.tiered import TieredCache
+from src.config import Config
+
+__all__ = ['MISSING', 'cache']
+
+cache = TieredCache(
+    l1=TTLCache(maxsize=Config.CACHE_L1_SIZE, ttl=Config.CACHE_DEFAULT_TTL),
+    l2=RedisBackend(url=Config.REDIS_URL) if Config.REDIS_URL else None,
+)
@@ -0,0 +1,80 @@
+import abc
+import dataclasses
+import time
+
+from redis.asyncio import Redis
+
+
+class CacheBackend(abc.ABC):
+    """
+    Общее хранилище второго уровня, значения уже сериализованы
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> bytes | None: ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    async def close(self) -> None:
+        pass
+
+
+@dataclasses.dataclass
+class InMemoryBackend(CacheBackend):
+    """
+    Замена Redis для тестов и локального запуска без него
+    """
+
+    _items: dict[str, tuple[float, bytes]] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._items.get(key)
+
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._items[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+
+
+@dataclasses.dataclass
+class RedisBackend(CacheBackend):
+    url: str
+
+    _redis: Redis | None = dataclasses.field(default=None, init=False)
+
+    def _get_redis(self) -> Redis:
+        if self._redis is None:
+            self._redis = Redis.from_url(self.url)
+
+        return self._redis
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._get_redis().get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._get_redis().set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._get_redis().delete(key)
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
@@ -0,0 +1,96 @@
+import collections
+import dataclasses
+import time
+import typing
+
+from src.cache.single_flight import SingleFlight
+
+T = typing.TypeVar('T')
+
+# Отличает отсутствие ключа от закешированного None
+MISSING = object()
+
+
+@dataclasses.dataclass
+class TTLCache:
+    """
+    Кеш в памяти процесса с временем жизни записей и вытеснением
+    давно не используемых при превышении maxsize.
+    Значения отдаются как есть, изменять их нельзя
+    """
+
+    maxsize: int = 1024
+    # Время жизни записи в секундах
+    ttl: float = 60 * 10
+    hits: int = dataclasses.field(default=0, init=False)
+    misses: int = dataclasses.field(default=0, init=False)
+
+    _items: collections.OrderedDict[typing.Hashable, tuple[float, typing.Any]] = (
+        dataclasses.field(default_factory=collections.OrderedDict, init=False)
+    )
+    _single_flight: SingleFlight = dataclasses.field(
+        default_factory=SingleFlight, init=False
+    )
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: typing.Hashable) -> typing.Any:
+        """
+        :return: Значение или MISSING, если ключа нет или запись устарела
+        """
+        item = self._items.get(key)
+
+        if item is None:
+            self.misses += 1
+            return MISSING
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            self.misses += 1
+            return MISSING
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self, key: typing.Hashable, value: typing.Any, ttl: float | None = None
+    ) -> None:
+        """
+        :param ttl: Время жизни записи, по умолчанию self.ttl
+        """
+        self._items[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._items.move_to_end(key)
+
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def delete(self, key: typing.Hashable) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    async def get_or_set(
+        self,
+        key: typing.Hashable,
+        factory: typing.Callable[[], typing.Awaitable[T]],
+        ttl: float | None = None,
+    ) -> T:
+        """
+        Возвращает значение из кеша или вызывает factory.
+        Одновременные промахи по одному ключу ждут один вызов factory,
+        ошибки не кешируются
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        async def _load() -> T:
+            value = await factory()
+            self.set(key, value, ttl=ttl)
+            return value
+
+        return await self._single_flight.run(key, _load)
@@ -0,0 +1,46 @@
+import asyncio
+import dataclasses
+import typing
+
+T = typing.TypeVar('T')
+
+
+@dataclasses.dataclass
+class SingleFlight:
+    """
+    Одновременные вызовы с одним ключом ждут один вызов factory
+    и получают один и тот же результат или исключение
+    """
+
+    _in_flight: dict[typing.Hashable, asyncio.Task] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def _on_done(self, key: typing.Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+        if not task.cancelled():
+            # Исключение получат вызывающие, здесь его не нужно логировать
+            task.exception()
+
+    async def run(
+        self,
+        key: typing.Hashable,
+        factory: typing.Callable[[], typing.Awaitable[T]],
+    ) -> T:
+        task = self._in_flight.get(key)
+
+        if task is None:
+            # factory выполняется отдельной задачей, а не в первом вызывающем,
+            # чтобы его отмена не отменяла вызов для остальных
+            task = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda done: self._on_done(key, done))
+            self._in_flight[key] = task
+
+        # shield - отмена одного вызывающего, в том числе первого,
+        # не отменяет вызов для остальных
+        return await asyncio.shield(task)
@@ -0,0 +1,116 @@
+import dataclasses
+import json
+import logging
+import typing
+
+from src.cache.backends import CacheBackend
+from src.cache.memory import MISSING, TTLCache
+
+log = logging.getLogger(__name__)
+
+T = typing.TypeVar('T')
+
+
+@dataclasses.dataclass
+class TieredCache:
+    """
+    Двухуровневый кеш: L1 в памяти процесса, L2 общий для всех процессов.
+    Значения в L2 хранятся в JSON. Ошибки L2 не роняют запрос,
+    значение тогда вычисляется заново
+    """
+
+    l1: TTLCache
+    l2: CacheBackend | None = None
+    # Префикс ключей в L2, чтобы не пересекаться с другими приложениями
+    namespace: str = 'imsolnce'
+    l2_hits: int = dataclasses.field(default=0, init=False)
+    l2_misses: int = dataclasses.field(default=0, init=False)
+
+    def _get_l2_key(self, key: str) -> str:
+        return f'{self.namespace}:{key}'
+
+    async def _get_l2(self, key: str) -> typing.Any:
+        if self.l2 is None:
+            return MISSING
+
+        try:
+            raw = await self.l2.get(self._get_l2_key(key))
+        except Exception:
+            log.exception('Ошибка чтения из кеша key=%s', key)
+            return MISSING
+
+        if raw is None:
+            self.l2_misses += 1
+            return MISSING
+
+        self.l2_hits += 1
+        return json.loads(raw)
+
+    async def _set_l2(self, key: str, value: typing.Any, ttl: float) -> None:
+        if self.l2 is None:
+            return
+
+        try:
+            await self.l2.set(
+                self._get_l2_key(key), json.dumps(value).encode(), ttl=ttl
+            )
+        except Exception:
+            log.exception('Ошибка записи в кеш key=%s', key)
+
+    async def get(self, key: str) -> typing.Any:
+        """
+        :return: Значение или MISSING (экспортируется из src.cache)
+        """
+        value = self.l1.get(key)
+        if value is not MISSING:
+            return value
+
+        value = await self._get_l2(key)
+        if value is not MISSING:
+            self.l1.set(key, value)
+
+        return value
+
+    async def set(self, key: str, value: typing.Any, ttl: float | None = None) -> None:
+        """
+        :param ttl: Время жизни записи в секундах, по умолчанию l1.ttl
+        """
+        ttl = ttl or self.l1.ttl
+        self.l1.set(key, value, ttl=ttl)
+        await self._set_l2(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self.l1.delete(key)
+
+        if self.l2 is not None:
+            try:
+                await self.l2.delete(self._get_l2_key(key))
+            except Exception:
+                log.exception('Ошибка удаления из кеша key=%s', key)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        factory: typing.Callable[[], typing.Awaitable[T]],
+        ttl: float | None = None,
+    ) -> T:
+        """
+        Возвращает значение из L1, затем из L2, иначе вызывает factory.
+        Одновременные промахи по ключу в процессе ждут одну загрузку
+        """
+        ttl = ttl or self.l1.ttl
+
+        async def _load() -> T:
+            value = await self._get_l2(key)
+            if value is not MISSING:
+                return value
+
+            value = await factory()
+            await self._set_l2(key, value, ttl=ttl)
+            return value
+
+        return await self.l1.get_or_set(key, factory=_load, ttl=ttl)
+
+    async def close(self) -> None:
+        if self.l2 is not None:
+            await self.l2.close()
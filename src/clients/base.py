@@ -1,12 +1,38 @@
+import asyncio
+import collections
 import dataclasses
+import json
 import logging
+import time
 import typing
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
 import aiohttp
+from pydantic import BaseModel
+
+from src import context
+from src.cache.single_flight import SingleFlight
+from src.clients import tracing
+from src.clients.rate_limit import RateLimiter, RedisRateLimiter
+from src.clients.retry import (
+    RetryableStatusError,
+    RetryPolicy,
+    get_circuit_breaker,
+    is_host_failure,
+    retries_total,
+)
 
 log = logging.getLogger(__name__)
 
+M = typing.TypeVar('M', bound=BaseModel)
+
+
+@dataclasses.dataclass
+class CachedResponse:
+    etag: str | None
+    last_modified: str | None
+    payload: typing.Any
+
 
 @dataclasses.dataclass
 class BaseClient:
@@ -24,8 +50,27 @@ class BaseClient:
     # headers: dict = dataclasses.field(default_factory=lambda: {'token': config.CS_ORS_SCORING_TOKEN})
     headers: dict = None
     is_raise_for_status: bool = False
+    # Ограничение частоты запросов к хосту, None - без ограничений
+    rate_limiter: RateLimiter | RedisRateLimiter | None = None
+    # Повторы при сетевых ошибках и 429/5xx, None - без повторов
+    # и без проверки статуса ответа
+    retry_policy: RetryPolicy | None = dataclasses.field(default_factory=RetryPolicy)
+    # Запоминать ETag/Last-Modified GET ответов и отправлять условные запросы,
+    # на 304 возвращается закешированный разобранный ответ (его нельзя изменять)
+    use_conditional_requests: bool = False
+    conditional_cache_size: int = 1024
+    # Одинаковые одновременные запросы (метод, url, параметры) отправляются
+    # один раз, все вызывающие получают один разобранный ответ (его нельзя изменять)
+    coalesce_requests: bool = False
+    coalesce_methods: frozenset[str] = frozenset({'GET', 'HEAD'})
 
     _session: aiohttp.ClientSession | None = dataclasses.field(default=None, init=False)
+    _single_flight: SingleFlight = dataclasses.field(
+        default_factory=SingleFlight, init=False
+    )
+    _conditional_cache: collections.OrderedDict[str, CachedResponse] = (
+        dataclasses.field(default_factory=collections.OrderedDict, init=False)
+    )
 
     def _get_session(self) -> aiohttp.ClientSession:
         # info
@@ -46,36 +91,225 @@ class BaseClient:
                 ),
                 headers=self.headers,
                 connector_owner=self.connector_owner,
+                trace_configs=[tracing.build_trace_config()],
             )
         return self._session
 
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
     @staticmethod
     async def handle_response(response: aiohttp.ClientResponse) -> str:
         return await response.text()
 
+    @staticmethod
+    def _get_conditional_key(method: str, full_url: str, params: dict) -> str | None:
+        if method != 'GET' or params.keys() - {'params'}:
+            return None
+
+        query = sorted((params.get('params') or {}).items())
+        return f'{full_url}?{query}'
+
+    def _add_conditional_headers(self, key: str, params: dict) -> None:
+        cached = self._conditional_cache.get(key)
+        if not cached:
+            return
+
+        headers = dict(params.get('headers') or {})
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+        params['headers'] = headers
+
+    def _store_conditional(
+        self, key: str, response: aiohttp.ClientResponse, payload: typing.Any
+    ) -> None:
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        if response.status != 200 or not (etag or last_modified):
+            self._conditional_cache.pop(key, None)
+            return
+
+        self._conditional_cache[key] = CachedResponse(
+            etag=etag, last_modified=last_modified, payload=payload
+        )
+        self._conditional_cache.move_to_end(key)
+
+        while len(self._conditional_cache) > self.conditional_cache_size:
+            self._conditional_cache.popitem(last=False)
+
     async def request(
         self,
         method: str,
         path: typing.Optional[str] = None,
+        response_model: type[M] | None = None,
         **params,
     ):
+        """
+        :param response_model: Модель, в которую тело ответа разбирается
+            сразу из байт через model_validate_json, минуя handle_response
+        """
         full_url = urljoin(self.base_url, path)
 
+        if not self.coalesce_requests or method not in self.coalesce_methods:
+            return await self._request(method, full_url, response_model, **params)
+
+        key = (
+            method,
+            full_url,
+            response_model,
+            json.dumps(params, sort_keys=True, default=str),
+        )
+        return await self._single_flight.run(
+            key, lambda: self._request(method, full_url, response_model, **params)
+        )
+
+    async def _request(
+        self,
+        method: str,
+        full_url: str,
+        response_model: type[M] | None,
+        **params,
+    ):
         log.debug('Request: method=%s full_url=%s params=%s', method, full_url, params)
 
-        async with self._get_session().request(
-            method=method, url=full_url, **params
-        ) as response:
-            # Базовый метод после выполнения выходит из контекста менеджера и закрывает соединения
-            # и соответственно в месте вызова не получить данные если их не подгрузить заранее
-            await response.read()
+        conditional_key = None
+        if self.use_conditional_requests:
+            conditional_key = self._get_conditional_key(method, full_url, params)
+
+        if conditional_key and response_model:
+            # Один url может разбираться в разные модели
+            conditional_key = f'{conditional_key}:{response_model.__qualname__}'
+
+        if conditional_key:
+            self._add_conditional_headers(conditional_key, params)
+
+        breaker = get_circuit_breaker(urlparse(full_url).hostname)
+        delays = (
+            self.retry_policy.get_delays()
+            if self.retry_policy and self.retry_policy.can_retry(method)
+            else iter(())
+        )
+
+        while True:
+            breaker.check()
+            delay = next(delays, None)
 
-            if self.is_raise_for_status:
-                response.raise_for_status()
+            try:
+                payload = await self._send_request(
+                    method,
+                    full_url,
+                    conditional_key=conditional_key,
+                    response_model=response_model,
+                    **params,
+                )
+            except Exception as e:
+                if not is_host_failure(e):
+                    # Хост ответил, ошибка в самом запросе
+                    breaker.record_success()
+                    raise
+
+                breaker.record_failure()
 
-            log.debug('Response: %s', (await response.read())[:1000])
+                if delay is None:
+                    raise
+
+                log.warning(
+                    'Retry request %s %s in %.2f s: %r', method, full_url, delay, e
+                )
+                retries_total.inc(host=breaker.host)
+                await asyncio.sleep(delay)
+                continue
 
-            return await self.handle_response(response=response)
+            breaker.record_success()
+            return payload
+
+    async def _send_request(
+        self,
+        method: str,
+        full_url: str,
+        conditional_key: str | None,
+        response_model: type[M] | None,
+        **params,
+    ):
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+
+        started = time.monotonic()
+        failed = False
+
+        try:
+            # ssl на запрос, чтобы не зависеть от настроек общего коннектора
+            params.setdefault('ssl', self.ssl)
+
+            async with self._get_session().request(
+                method=method, url=full_url, **params
+            ) as response:
+                # Базовый метод после выполнения выходит из контекста менеджера и закрывает соединения
+                # и соответственно в месте вызова не получить данные если их не подгрузить заранее
+                body_started = time.monotonic()
+                body = await response.read()
+                tracing.observe_phase(
+                    response.url,
+                    phase='body',
+                    seconds=time.monotonic() - body_started,
+                )
+                failed = response.status >= 400
+
+                # С политикой повторов 429/5xx всегда ошибка,
+                # чтобы их учитывал circuit breaker
+                if self.retry_policy and response.status in self.retry_policy.statuses:
+                    raise RetryableStatusError(response.status)
+
+                if (
+                    conditional_key
+                    and response.status == 304
+                    and conditional_key in self._conditional_cache
+                ):
+                    log.debug('Response: 304 Not Modified %s', full_url)
+                    self._conditional_cache.move_to_end(conditional_key)
+                    return self._conditional_cache[conditional_key].payload
+
+                if self.is_raise_for_status:
+                    response.raise_for_status()
+
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug('Response: %s', body[:1000])
+
+                if response_model:
+                    payload = response_model.model_validate_json(body)
+                else:
+                    payload = await self.handle_response(response=response)
+
+                if conditional_key:
+                    self._store_conditional(conditional_key, response, payload)
+
+                return payload
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Статистика внешних вызовов для отчета о запуске задачи
+            report = context.job_report.get()
+            if report:
+                report.add_external_call(
+                    service=urlparse(full_url).hostname,
+                    latency=time.monotonic() - started,
+                    error=failed,
+                )
+
+    async def request_model(
+        self,
+        method: str,
+        path: typing.Optional[str],
+        response_model: type[M],
+        **params,
+    ) -> M:
+        return await self.request(method, path, response_model=response_model, **params)
 
     async def get(self, *args, **kwargs):
         return await self.request('GET', *args, **kwargs)
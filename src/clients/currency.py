@@ -1,9 +1,11 @@
 import dataclasses
 import typing
+from urllib.parse import urlparse
 
 from pydantic import BaseModel, model_validator
 
 from src.clients.base import JsonBaseClient
+from src.clients.rate_limit import RateLimiter, RedisRateLimiter, get_rate_limiter
 from src.config import Config
 from src.enums import Currency
 
@@ -40,6 +42,13 @@ class ExchangeResponseError(Exception):
 @dataclasses.dataclass
 class CurrencyExchangeClient(JsonBaseClient):
     base_url: str = Config.CURRENCY_EXCHANGE_URL
+    use_conditional_requests: bool = True
+    rate_limiter: RateLimiter | RedisRateLimiter | None = dataclasses.field(
+        default_factory=lambda: get_rate_limiter(
+            urlparse(Config.CURRENCY_EXCHANGE_URL).netloc,
+            rate=Config.CURRENCY_EXCHANGE_RPS,
+        )
+    )
 
     async def request(
         self,
@@ -1,8 +1,10 @@
 import dataclasses
+from urllib.parse import urlparse
 
-from pydantic import BaseModel, model_validator
+from pydantic import AliasPath, BaseModel, Field
 
 from src.clients.base import JsonBaseClient
+from src.clients.rate_limit import RateLimiter, RedisRateLimiter, get_rate_limiter
 from src.config import Config
 
 
@@ -11,14 +13,9 @@ class SeriesBase(BaseModel):
     series_id: int
     url: str
     year: str
-    image_url: str | None
-
-    @model_validator(mode='before')
-    @classmethod
-    def handle_image_url(cls, data: dict) -> dict:
-        data['image_url'] = data['image']['url']['original']
-
-        return data
+    image_url: str | None = Field(
+        default=None, validation_alias=AliasPath('image', 'url', 'original')
+    )
 
 
 class Series(SeriesBase):
@@ -37,11 +34,23 @@ class SearchSeriesResponse(BaseModel):
 @dataclasses.dataclass
 class MangaUpdatesClient(JsonBaseClient):
     base_url: str = Config.MANGA_UPDATES_URL
+    use_conditional_requests: bool = True
+    coalesce_requests: bool = True
+    rate_limiter: RateLimiter | RedisRateLimiter | None = dataclasses.field(
+        default_factory=lambda: get_rate_limiter(
+            urlparse(Config.MANGA_UPDATES_URL).netloc, rate=Config.MANGA_UPDATES_RPS
+        )
+    )
 
     async def get_series(self, series_id: str) -> Series:
-        return Series(**await self.get(f'/v1/series/{series_id}'))
+        return await self.request_model(
+            'GET', f'/v1/series/{series_id}', response_model=Series
+        )
 
     async def search_series(self, search_text: str) -> SearchSeriesResponse:
-        return SearchSeriesResponse(
-            **await self.post('/v1/series/search', json={'search': search_text})
+        return await self.request_model(
+            'POST',
+            '/v1/series/search',
+            response_model=SearchSeriesResponse,
+            json={'search': search_text},
         )
@@ -0,0 +1,311 @@
+import asyncio
+import dataclasses
+import logging
+import time
+import typing
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.config import Config
+
+log = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class RateLimiter:
+    """
+    Token bucket: не больше rate запросов в секунду с допустимым всплеском capacity
+    """
+
+    rate: float
+    capacity: float | None = None
+
+    _tokens: float = dataclasses.field(default=None, init=False)
+    _updated_at: float = dataclasses.field(default=None, init=False)
+    _lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock, init=False)
+
+    def __post_init__(self):
+        if self.capacity is None:
+            self.capacity = max(self.rate, 1)
+
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        # Лок выстраивает ожидающих в очередь, чтобы токены выдавались по порядку
+        async with self._lock:
+            self._refill()
+
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+
+            self._tokens -= 1
+
+    async def __aenter__(self) -> 'RateLimiter':
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        pass
+
+
+# Token bucket в Redis: возвращает, сколько секунд ждать токен, 0 - токен получен.
+# Время берется из Redis, чтобы не зависеть от часов процессов
+REDIS_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+# Через сколько секунд снова обращаться к Redis после ошибки
+REDIS_RETRY_INTERVAL = 5
+
+# Клиенты Redis по url, общие для всех лимитеров
+_redis_clients: dict[str, Redis] = {}
+
+
+def _get_redis(url: str) -> Redis:
+    if url not in _redis_clients:
+        _redis_clients[url] = Redis.from_url(url)
+
+    return _redis_clients[url]
+
+
+@dataclasses.dataclass
+class KeyedRateLimiter:
+    """
+    Отдельный лимит rate запросов в секунду на каждый ключ, например на чат,
+    без всплесков
+    """
+
+    rate: float
+    # Чтобы словарь времени следующего слота по ключам не рос бесконечно
+    max_size: int = 10_000
+
+    _slots: dict[str, float] = dataclasses.field(default_factory=dict, init=False)
+
+    async def acquire(self, key: str) -> None:
+        now = time.monotonic()
+
+        if len(self._slots) > self.max_size:
+            self._slots = {
+                slot_key: slot for slot_key, slot in self._slots.items() if slot > now
+            }
+
+        # Слот резервируется до await, поэтому параллельные запросы с одним ключом
+        # получают разные слоты
+        slot = max(now, self._slots.get(key, 0.0))
+        self._slots[key] = slot + 1 / self.rate
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+@dataclasses.dataclass
+class _RedisTokenBucket:
+    """
+    Вызов REDIS_TOKEN_BUCKET_SCRIPT. После ошибки Redis не опрашивается
+    REDIS_RETRY_INTERVAL секунд, лимит тогда считается в процессе
+    """
+
+    key: str
+    rate: float
+    url: str
+    capacity: float | None = None
+
+    _script: typing.Any = dataclasses.field(default=None, init=False)
+    # Пока monotonic меньше, Redis не опрашивается
+    _fallback_until: float | None = dataclasses.field(default=None, init=False)
+
+    def __post_init__(self):
+        if self.capacity is None:
+            self.capacity = max(self.rate, 1)
+
+    def _get_script(self) -> typing.Any:
+        if self._script is None:
+            self._script = _get_redis(self.url).register_script(
+                REDIS_TOKEN_BUCKET_SCRIPT
+            )
+
+        return self._script
+
+    async def _get_wait(self, key: str) -> float | None:
+        """
+        :return: Сколько секунд ждать токен, 0 - токен получен,
+            None - Redis недоступен
+        """
+        if self._fallback_until and time.monotonic() < self._fallback_until:
+            return None
+
+        try:
+            wait = float(
+                await self._get_script()(
+                    keys=[f'rate_limit:{key}'], args=[self.rate, self.capacity]
+                )
+            )
+        except RedisError:
+            if not self._fallback_until:
+                log.exception(
+                    'Redis недоступен, лимит %s считается в процессе', self.key
+                )
+
+            self._fallback_until = time.monotonic() + REDIS_RETRY_INTERVAL
+            return None
+
+        if self._fallback_until:
+            log.info('Redis доступен, лимит %s снова общий', self.key)
+            self._fallback_until = None
+
+        return wait
+
+
+@dataclasses.dataclass
+class RedisRateLimiter(_RedisTokenBucket):
+    """
+    Token bucket в Redis: лимит rate запросов в секунду общий для всех процессов.
+    Пока Redis недоступен, лимит считается в процессе, как в RateLimiter
+    """
+
+    _lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock, init=False)
+    _fallback: RateLimiter = dataclasses.field(default=None, init=False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._fallback = RateLimiter(rate=self.rate, capacity=self.capacity)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                wait = await self._get_wait(self.key)
+
+                if wait is None:
+                    await self._fallback.acquire()
+                    return
+
+                if not wait:
+                    return
+
+                await asyncio.sleep(wait)
+
+    async def __aenter__(self) -> 'RedisRateLimiter':
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        pass
+
+
+@dataclasses.dataclass
+class RedisKeyedRateLimiter(_RedisTokenBucket):
+    """
+    Отдельный token bucket в Redis на каждый ключ, общий для всех процессов.
+    Пока Redis недоступен, лимит считается в процессе, как в KeyedRateLimiter
+    """
+
+    capacity: float | None = 1
+
+    _fallback: KeyedRateLimiter = dataclasses.field(default=None, init=False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._fallback = KeyedRateLimiter(rate=self.rate)
+
+    async def acquire(self, key: str) -> None:
+        while True:
+            wait = await self._get_wait(f'{self.key}:{key}')
+
+            if wait is None:
+                await self._fallback.acquire(key)
+                return
+
+            if not wait:
+                return
+
+            await asyncio.sleep(wait)
+
+
+_rate_limiters: dict[str, RateLimiter | RedisRateLimiter] = {}
+_keyed_rate_limiters: dict[str, KeyedRateLimiter | RedisKeyedRateLimiter] = {}
+
+
+def _is_shared() -> bool:
+    return bool(Config.RATE_LIMIT_SHARED and Config.REDIS_URL)
+
+
+def get_rate_limiter(key: str, rate: float) -> RateLimiter | RedisRateLimiter:
+    """
+    Один лимитер на хост/эндпоинт в процессе, общий для всех клиентов.
+    При RATE_LIMIT_SHARED лимит делится между процессами через Redis
+
+    :param key: Хост с портом или эндпоинт, например api.mangaupdates.com
+    """
+    if key in _rate_limiters:
+        if _rate_limiters[key].rate != rate:
+            log.warning(
+                'Лимитер %s уже создан с rate=%s, rate=%s не применяется',
+                key,
+                _rate_limiters[key].rate,
+                rate,
+            )
+    elif _is_shared():
+        _rate_limiters[key] = RedisRateLimiter(key=key, rate=rate, url=Config.REDIS_URL)
+    else:
+        _rate_limiters[key] = RateLimiter(rate=rate)
+
+    return _rate_limiters[key]
+
+
+def get_keyed_rate_limiter(
+    key: str, rate: float
+) -> KeyedRateLimiter | RedisKeyedRateLimiter:
+    """
+    Как get_rate_limiter, но лимит отдельный на каждый ключ acquire,
+    например на чат телеграма
+    """
+    if key not in _keyed_rate_limiters:
+        if _is_shared():
+            _keyed_rate_limiters[key] = RedisKeyedRateLimiter(
+                key=key, rate=rate, url=Config.REDIS_URL
+            )
+        else:
+            _keyed_rate_limiters[key] = KeyedRateLimiter(rate=rate)
+
+    return _keyed_rate_limiters[key]
+
+
+async def close_rate_limiters() -> None:
+    for redis in _redis_clients.values():
+        await redis.aclose()
+    _redis_clients.clear()
+
+    for rate_limiter in [*_rate_limiters.values(), *_keyed_rate_limiters.values()]:
+        if isinstance(rate_limiter, _RedisTokenBucket):
+            # Скрипт привязан к закрытому клиенту
+            rate_limiter._script = None
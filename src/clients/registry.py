@@ -0,0 +1,96 @@
+import collections
+import dataclasses
+import typing
+
+import aiohttp
+
+from src.clients.base import BaseClient
+from src.config import Config
+from src.metrics import registry as metrics_registry
+
+C = typing.TypeVar('C', bound=BaseClient)
+
+pool_limit = metrics_registry.gauge(
+    'http_pool_limit', 'Максимум соединений в общем пуле клиентов'
+)
+pool_acquired = metrics_registry.gauge(
+    'http_pool_acquired', 'Соединения общего пула, занятые запросами'
+)
+pool_idle = metrics_registry.gauge(
+    'http_pool_idle', 'Открытые keep-alive соединения общего пула по хостам'
+)
+
+
+@dataclasses.dataclass
+class ClientRegistry:
+    """
+    Клиенты внешних API, по одному на класс в процессе,
+    с общим TCPConnector: keep-alive соединения и DNS кеш переиспользуются.
+    Закрывается в lifespan каждой точки входа
+    """
+
+    limit: int = Config.HTTP_POOL_LIMIT
+    limit_per_host: int = Config.HTTP_POOL_LIMIT_PER_HOST
+    ttl_dns_cache: int = Config.HTTP_DNS_CACHE_TTL
+    keepalive_timeout: float = Config.HTTP_KEEPALIVE_TIMEOUT
+
+    _connector: aiohttp.TCPConnector | None = dataclasses.field(
+        default=None, init=False
+    )
+    _clients: dict[type[BaseClient], BaseClient] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+
+    def get_connector(self) -> aiohttp.TCPConnector:
+        # Коннектор создается внутри работающего лупа, при первом запросе
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.ttl_dns_cache,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+
+        return self._connector
+
+    def get(self, client_class: type[C]) -> C:
+        if client_class not in self._clients:
+            self._clients[client_class] = client_class(
+                connector=lambda ssl: self.get_connector(),
+                connector_owner=False,
+            )
+
+        return self._clients[client_class]
+
+    async def close(self) -> None:
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+    def collect_metrics(self) -> None:
+        pool_limit.set(self.limit)
+        # Хосты, у которых не осталось свободных соединений, пропадают из _conns
+        pool_idle.clear()
+
+        if self._connector is None:
+            pool_acquired.set(0)
+            return
+
+        # Публичного API для размера пула нет, читаются внутренние атрибуты
+        # BaseConnector, проверено на aiohttp==3.12.6 (закреплен в pyproject.toml)
+        pool_acquired.set(len(self._connector._acquired))
+
+        idle_by_host = collections.Counter()
+        for (host, *_), connections in self._connector._conns.items():
+            idle_by_host[host] += len(connections)
+
+        for host, idle in idle_by_host.items():
+            pool_idle.set(idle, host=host)
+
+
+clients = ClientRegistry()
+metrics_registry.add_collector(clients.collect_metrics)
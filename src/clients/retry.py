@@ -0,0 +1,166 @@
+import asyncio
+import dataclasses
+import enum
+import logging
+import time
+import typing
+
+import aiohttp
+import backoff
+
+from src.config import Config
+from src.metrics import registry
+
+log = logging.getLogger(__name__)
+
+retries_total = registry.counter(
+    'http_client_retries_total', 'Повторные запросы к внешним сервисам'
+)
+circuit_rejected_total = registry.counter(
+    'http_client_circuit_rejected_total',
+    'Запросы, отклоненные без отправки из-за открытого circuit breaker',
+)
+circuit_state = registry.gauge(
+    'http_client_circuit_state',
+    'Состояние circuit breaker: 0 closed, 1 open, 2 half-open',
+)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str):
+        self.host = host
+        super().__init__(f'Circuit breaker is open for {host}')
+
+
+class RetryableStatusError(Exception):
+    """Ответ со статусом, после которого запрос можно повторить"""
+
+    def __init__(self, status: int):
+        self.status = status
+        super().__init__(f'Retryable response status {status}')
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    # Всего попыток, включая первую
+    max_tries: int = Config.CLIENT_RETRY_MAX_TRIES
+    # Задержки: full jitter от factor * base ** n, не больше max_delay секунд
+    base: float = 2
+    factor: float = 0.5
+    max_delay: float = 10
+    statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+    # Повторяются только идемпотентные запросы
+    methods: frozenset[str] = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+    def get_delays(self) -> typing.Iterator[float]:
+        delays = backoff.expo(
+            base=self.base, factor=self.factor, max_value=self.max_delay
+        )
+        # Генератор backoff сначала отдает None
+        next(delays)
+
+        for _ in range(self.max_tries - 1):
+            yield backoff.full_jitter(next(delays))
+
+    def can_retry(self, method: str) -> bool:
+        return self.max_tries > 1 and method.upper() in self.methods
+
+
+class CircuitState(enum.IntEnum):
+    closed = 0
+    open = 1
+    half_open = 2
+
+
+@dataclasses.dataclass
+class CircuitBreaker:
+    """
+    После failure_threshold ошибок подряд запросы к хосту отклоняются сразу.
+    Через reset_timeout пропускается один пробный запрос:
+    успех закрывает breaker, ошибка открывает снова
+    """
+
+    host: str
+    failure_threshold: int = Config.CLIENT_CIRCUIT_FAILURE_THRESHOLD
+    reset_timeout: float = Config.CLIENT_CIRCUIT_RESET_TIMEOUT
+
+    _failures: int = dataclasses.field(default=0, init=False)
+    _opened_at: float | None = dataclasses.field(default=None, init=False)
+    # Время начала пробного запроса, None - пробного запроса нет
+    _trial_started_at: float | None = dataclasses.field(default=None, init=False)
+
+    @property
+    def state(self) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.closed
+
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return CircuitState.half_open
+
+        return CircuitState.open
+
+    def _set_state_metric(self) -> None:
+        circuit_state.set(self.state, host=self.host)
+
+    def check(self) -> None:
+        """
+        :raises CircuitOpenError: Запрос нельзя отправлять
+        """
+        state = self.state
+
+        if state == CircuitState.closed:
+            return
+
+        now = time.monotonic()
+        # Пробный запрос мог быть отменен, тогда через reset_timeout пускаем новый
+        if state == CircuitState.half_open and (
+            self._trial_started_at is None
+            or now - self._trial_started_at >= self.reset_timeout
+        ):
+            self._trial_started_at = now
+            self._set_state_metric()
+            return
+
+        circuit_rejected_total.inc(host=self.host)
+        raise CircuitOpenError(self.host)
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started_at = None
+        self._set_state_metric()
+
+    def record_failure(self) -> None:
+        self._failures += 1
+
+        if (
+            self._trial_started_at is not None
+            or self._failures >= self.failure_threshold
+        ):
+            if self.state == CircuitState.closed:
+                log.warning('Circuit breaker opened for %s', self.host)
+            self._opened_at = time.monotonic()
+
+        self._trial_started_at = None
+        self._set_state_metric()
+
+
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """Один breaker на хост в процессе, общий для всех клиентов"""
+    if host not in _circuit_breakers:
+        _circuit_breakers[host] = CircuitBreaker(host=host)
+
+    return _circuit_breakers[host]
+
+
+def is_host_failure(error: Exception) -> bool:
+    """Ошибки, говорящие о проблемах на стороне хоста, а не запроса"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+
+    return isinstance(
+        error, (RetryableStatusError, aiohttp.ClientError, asyncio.TimeoutError)
+    )
@@ -1,71 +1,196 @@
+import asyncio
+import dataclasses
+import logging
+import pathlib
+import time
+from urllib.parse import urlparse
+
 from gql import Client, gql
+from gql.client import AsyncClientSession
 from gql.transport.aiohttp import AIOHTTPTransport
+from graphql import DocumentNode, print_schema
+
+from src import context
+from src.clients import tracing
+from src.clients.rate_limit import RateLimiter, RedisRateLimiter, get_rate_limiter
+from src.clients.registry import clients
+from src.config import Config
+
+log = logging.getLogger(__name__)
+
+# Схема API для валидации запросов, обновляется через
+# python -m src.clients.shikimori
+SCHEMA_PATH = pathlib.Path(__file__).parents[2] / 'resources' / 'shikimori.graphql'
 
 
 class InvalidRequest(Exception):
     pass
 
 
-async def send_shikimori(
-    text: str | None = None,
-    ids: list[str] | None = None,
-    limit: int = 1,
-) -> dict:
-    transport = AIOHTTPTransport(url='https://shikimori.one/api/graphql')
-
-    query = []
-
-    if text:
-        query.append(f'search: "{text}"')
-
-    if ids:
-        query.append(f'ids: "{",".join(ids)}"')
-
-    if not query:
-        raise InvalidRequest('No query was provided')
-
-    query = ', '.join(query)
-
-    async with Client(
-        transport=transport,
-        fetch_schema_from_transport=True,
-    ) as session:
-        query = gql(
-            f"""
-                {{
-                  animes({query}, limit: {limit}) {{
-                    id
-                    malId
-                    name
-                    russian
-                    licenseNameRu
-                    english
-                    japanese
-                    synonyms
-                    kind
-                    rating
-                    score
-                    status
-                    episodes
-                    episodesAired
-                    duration
-                    airedOn {{ year month day date }}
-                    releasedOn {{ year month day date }}
-                    url
-                    season
-
-                    poster {{ id originalUrl mainUrl }}
-
-                    fansubbers
-                    fandubbers
-                    licensors
-                    createdAt,
-                    updatedAt,
-                    nextEpisodeAt,
-                    isCensored
-                  }}
-                }}
-                """
+def _build_animes_query(fields: str) -> DocumentNode:
+    # Пользовательский текст передается переменной, а не подставляется в запрос
+    return gql(
+        f"""
+            query Animes($search: String, $ids: String, $limit: PositiveInt) {{
+              animes(search: $search, ids: $ids, limit: $limit) {{
+                {fields}
+              }}
+            }}
+            """
+    )
+
+
+# Карточка аниме при поиске в боте
+ANIME_SEARCH_CARD_QUERY = _build_animes_query(
+    """
+    id
+    name
+    russian
+    url
+    episodes
+    episodesAired
+    nextEpisodeAt
+    airedOn { year }
+    poster { originalUrl }
+    """
+)
+# Обновление расписания выхода серий в задачах
+ANIME_SCHEDULE_QUERY = _build_animes_query(
+    """
+    id
+    episodes
+    episodesAired
+    nextEpisodeAt
+    """
+)
+
+
+@dataclasses.dataclass
+class ShikimoriClient:
+    """
+    Один GraphQL клиент на процесс: соединение переиспользуется,
+    схема читается из локального файла вместо интроспекции на каждый запрос.
+    Если файла нет, запросы отправляются без валидации
+    """
+
+    url: str = Config.SHIKIMORI_URL
+    schema_path: pathlib.Path = SCHEMA_PATH
+    execute_timeout: int = 30
+    rate_limiter: RateLimiter | RedisRateLimiter | None = dataclasses.field(
+        default_factory=lambda: get_rate_limiter(
+            urlparse(Config.SHIKIMORI_URL).netloc, rate=Config.SHIKIMORI_RPS
+        )
+    )
+
+    _session: AsyncClientSession | None = dataclasses.field(default=None, init=False)
+    _client: Client | None = dataclasses.field(default=None, init=False)
+    _lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock, init=False)
+
+    def _load_schema(self) -> str | None:
+        try:
+            return self.schema_path.read_text()
+        except FileNotFoundError:
+            log.warning(
+                'Схема шикимори не найдена в %s, запросы без валидации',
+                self.schema_path,
+            )
+            return None
+
+    async def _get_session(self) -> AsyncClientSession:
+        async with self._lock:
+            if self._session is None:
+                self._client = Client(
+                    transport=AIOHTTPTransport(
+                        url=self.url,
+                        # Общий пул соединений с остальными клиентами
+                        client_session_args={
+                            'connector': clients.get_connector(),
+                            'connector_owner': False,
+                            'trace_configs': [tracing.build_trace_config()],
+                        },
+                    ),
+                    schema=self._load_schema(),
+                    execute_timeout=self.execute_timeout,
+                )
+                self._session = await self._client.connect_async()
+
+        return self._session
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._client is not None:
+                # gql не закрывает сессию, если коннектор не ее,
+                # сам общий коннектор закрывает clients
+                if self._client.transport.session is not None:
+                    await self._client.transport.session.close()
+                await self._client.close_async()
+            self._client = None
+            self._session = None
+
+    async def execute(
+        self, query: DocumentNode, variable_values: dict | None = None
+    ) -> dict:
+        session = await self._get_session()
+
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+
+        started = time.monotonic()
+        failed = False
+
+        try:
+            return await session.execute(query, variable_values=variable_values)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            report = context.job_report.get()
+            if report:
+                report.add_external_call(
+                    service='shikimori',
+                    latency=time.monotonic() - started,
+                    error=failed,
+                )
+
+    async def refresh_schema(self) -> None:
+        """
+        Скачивает схему интроспекцией и сохраняет в schema_path,
+        следующее подключение будет ее использовать
+        """
+        async with Client(
+            transport=AIOHTTPTransport(url=self.url),
+            fetch_schema_from_transport=True,
+        ) as session:
+            self.schema_path.write_text(print_schema(session.client.schema))
+
+        await self.close()
+
+    async def get_animes(
+        self,
+        query: DocumentNode,
+        text: str | None = None,
+        ids: list[str] | None = None,
+        limit: int = 1,
+    ) -> dict:
+        """
+        :param query: Запрос с нужным набором полей, ANIME_SEARCH_CARD_QUERY
+            или ANIME_SCHEDULE_QUERY
+        """
+        if not text and not ids:
+            raise InvalidRequest('No query was provided')
+
+        return await self.execute(
+            query,
+            variable_values={
+                'search': text or None,
+                'ids': ','.join(ids) if ids else None,
+                'limit': limit,
+            },
         )
 
-        return await session.execute(query)
+
+shikimori_client = ShikimoriClient()
+
+
+if __name__ == '__main__':
+    asyncio.run(shikimori_client.refresh_schema())
@@ -0,0 +1,158 @@
+import logging
+import re
+import time
+import types
+
+import aiohttp
+from yarl import URL
+
+from src.metrics import registry
+
+log = logging.getLogger(__name__)
+
+phase_seconds = registry.histogram(
+    'http_client_phase_seconds',
+    'Длительность этапов запроса к внешним сервисам: queue - ожидание соединения '
+    'в пуле, dns, connect - TCP и TLS, ttfb - до заголовков ответа, body - загрузка тела',
+)
+connections_total = registry.counter(
+    'http_client_connections_total',
+    'Соединения для запросов к внешним сервисам, reused - взято из keep-alive пула',
+)
+errors_total = registry.counter(
+    'http_client_errors_total', 'Запросы к внешним сервисам, завершившиеся ошибкой'
+)
+
+# Числа, uuid и ключи API в пути заменяются, чтобы не раздувать метрики
+# и не светить ключи (exchangerate-api передает ключ в пути)
+_PATH_PARAM_RE = re.compile(r'/(\d+|[0-9a-fA-F-]{16,}|[A-Za-z0-9_-]{24,})(?=/|$)')
+
+
+def get_endpoint(url: URL) -> str:
+    return _PATH_PARAM_RE.sub('/{id}', url.path) or '/'
+
+
+def observe_phase(url: URL, phase: str, seconds: float) -> None:
+    phase_seconds.observe(
+        seconds, host=url.host or '', endpoint=get_endpoint(url), phase=phase
+    )
+
+
+def _elapsed(context: types.SimpleNamespace, started_attr: str) -> float:
+    return time.monotonic() - getattr(context, started_attr)
+
+
+async def _on_request_start(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceRequestStartParams,
+) -> None:
+    context.url = params.url
+    context.started = time.monotonic()
+    context.phases = {}
+
+
+async def _on_connection_queued_start(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceConnectionQueuedStartParams,
+) -> None:
+    context.queued = time.monotonic()
+
+
+async def _on_connection_queued_end(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceConnectionQueuedEndParams,
+) -> None:
+    context.phases['queue'] = _elapsed(context, 'queued')
+
+
+async def _on_dns_resolvehost_start(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceDnsResolveHostStartParams,
+) -> None:
+    context.dns_started = time.monotonic()
+
+
+async def _on_dns_resolvehost_end(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceDnsResolveHostEndParams,
+) -> None:
+    context.phases['dns'] = _elapsed(context, 'dns_started')
+
+
+async def _on_connection_create_start(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceConnectionCreateStartParams,
+) -> None:
+    context.connect_started = time.monotonic()
+
+
+async def _on_connection_create_end(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceConnectionCreateEndParams,
+) -> None:
+    context.phases['connect'] = _elapsed(context, 'connect_started')
+    connections_total.inc(host=context.url.host or '', reused='false')
+
+
+async def _on_connection_reuseconn(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceConnectionReuseconnParams,
+) -> None:
+    connections_total.inc(host=context.url.host or '', reused='true')
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceRequestEndParams,
+) -> None:
+    # Вызывается после получения заголовков ответа, тело читает вызывающий
+    context.phases['ttfb'] = _elapsed(context, 'started')
+
+    for phase, seconds in context.phases.items():
+        observe_phase(context.url, phase=phase, seconds=seconds)
+
+    log.debug(
+        'Trace %s %s %s: %s',
+        params.method,
+        get_endpoint(context.url),
+        params.response.status,
+        ' '.join(
+            f'{phase}={seconds:.3f}s' for phase, seconds in context.phases.items()
+        ),
+    )
+
+
+async def _on_request_exception(
+    session: aiohttp.ClientSession,
+    context: types.SimpleNamespace,
+    params: aiohttp.TraceRequestExceptionParams,
+) -> None:
+    errors_total.inc(
+        host=context.url.host or '',
+        endpoint=get_endpoint(context.url),
+        error=type(params.exception).__name__,
+    )
+
+
+def build_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_connection_queued_start.append(_on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(_on_connection_queued_end)
+    trace_config.on_dns_resolvehost_start.append(_on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(_on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
@@ -1,3 +1,4 @@
+import datetime
 import logging
 import sys
 
@@ -5,6 +6,8 @@ from dotenv import dotenv_values
 from pydantic import BaseModel, Field
 import pathlib
 
+from src.enums import DigestFormat
+
 
 class ConfigENV(BaseModel):
     DB_HOST: str
@@ -22,11 +25,84 @@ class ConfigENV(BaseModel):
     CURRENCY_EXCHANGE_GET_PERIOD: int | None = Field(default=60 * 60 * 6)
     NOTIFICATION_PERIOD_ANIME: int | None = Field(default=60 * 15)
     NOTIFICATION_PERIOD_MANGA: int | None = Field(default=60 * 60)
+    # Уведомления по аниме по времени выхода серии вместо периодического опроса
+    ANIME_SCHEDULER_ENABLED: bool = Field(default=True)
+    # Через сколько после выхода серии проверять шикимори
+    ANIME_SCHEDULER_DELAY: int = Field(default=60 * 10)
+    ANIME_SCHEDULER_RETRY_DELAY: int = Field(default=60 * 15)
+    # Сколько ждать обновления шикимори, после этого уведомляем без подтверждения
+    ANIME_SCHEDULER_MAX_WAIT: int = Field(default=60 * 60 * 24)
+    # Сдвиг nextEpisodeAt без новой серии меньше этого считается переносом выхода,
+    # больший (например, на следующую неделю) ждет подтверждения серии
+    ANIME_SCHEDULER_POSTPONE_WINDOW: int = Field(default=60 * 60 * 24 * 2)
+    # Как часто подхватывать новые аниме из базы (подписки из бота)
+    ANIME_SCHEDULER_RESYNC_PERIOD: int = Field(default=60 * 60)
+    # Сколько строк аниме/манги процесс арендует за раз и на сколько секунд
+    CLAIM_BATCH_SIZE: int = Field(default=100)
+    CLAIM_LEASE: int = Field(default=60 * 5)
+    # Максимум id в одном запросе animes в шикимори (limit <= 50)
+    SHIKIMORI_BATCH_SIZE: int = Field(default=50)
+    # Дольше этого интервала манга не остается без проверки
+    MANGA_MAX_CHECK_INTERVAL: int = Field(default=60 * 60 * 24 * 7)
+    # Сколько последних глав учитывать при расчете периодичности выхода
+    MANGA_CADENCE_HISTORY: int = Field(default=10)
     MANGA_UPDATES_URL: str | None = Field(default='https://api.mangaupdates.com/')
+    # Сколько запросов в MangaUpdates может выполняться одновременно
+    MANGA_UPDATES_CONCURRENCY: int = Field(default=10)
+    MANGA_UPDATES_RPS: float = Field(default=5)
     CURRENCY_EXCHANGE_URL: str | None = Field(
         default='https://v6.exchangerate-api.com/v6/'
     )
     CURRENCY_EXCHANGE_API_KEY: str | None = Field(default=None)
+    CURRENCY_EXCHANGE_RPS: float = Field(default=10)
+    # Сколько курсов запрашивать одновременно
+    CURRENCY_EXCHANGE_CONCURRENCY: int = Field(default=8)
+    SHIKIMORI_URL: str = Field(default='https://shikimori.one/api/graphql')
+    # Шикимори ограничивает API 5 запросами в секунду
+    SHIKIMORI_RPS: float = Field(default=5)
+    # Лимиты запросов к внешним API общие для всех процессов через Redis (REDIS_URL)
+    RATE_LIMIT_SHARED: bool = Field(default=False)
+    # Телеграм допускает ~30 сообщений в секунду на бота и ~1 в секунду в один чат
+    TELEGRAM_GLOBAL_RPS: float = Field(default=25)
+    TELEGRAM_PER_CHAT_RPS: float = Field(default=1)
+    TELEGRAM_BROADCAST_CONCURRENCY: int = Field(default=20)
+    # Объединять уведомления за запуск задачи в одно сообщение на пользователя,
+    # пользователь может переопределить командой /digest
+    NOTIFICATION_DIGEST_ENABLED: bool = Field(default=False)
+    NOTIFICATION_DIGEST_FORMAT: DigestFormat = Field(default=DigestFormat.album)
+    # Часовой пояс и тихие часы пользователей, которые их не настроили,
+    # None - часовой пояс сервера и тихих часов нет
+    NOTIFICATION_TIMEZONE: str | None = Field(default=None)
+    QUIET_HOURS_START: datetime.time | None = Field(default=None)
+    QUIET_HOURS_END: datetime.time | None = Field(default=None)
+    # Сколько подписчиков читать из базы за раз при рассылке
+    SUBSCRIBERS_CHUNK_SIZE: int = Field(default=1000)
+    # Уведомления пишутся в outbox и доставляются воркерами listener.py
+    NOTIFICATION_OUTBOX_ENABLED: bool = Field(default=False)
+    OUTBOX_PUBLISH_PERIOD: int = Field(default=30)
+    OUTBOX_PUBLISH_BATCH_SIZE: int = Field(default=500)
+    OUTBOX_REDELIVER_AFTER: int = Field(default=60 * 10)
+    # Аренда сообщения на время отправки, после нее сообщение доставляется заново
+    OUTBOX_SENDING_LEASE: int = Field(default=60 * 10)
+    # Повторы отправки после временных ошибок телеграма: задержка удваивается
+    # с каждой попыткой, после OUTBOX_MAX_ATTEMPTS сообщение помечается failed
+    OUTBOX_MAX_ATTEMPTS: int = Field(default=5)
+    OUTBOX_RETRY_DELAY: int = Field(default=60)
+    # Повторы запросов внешних клиентов и circuit breaker по хосту
+    CLIENT_RETRY_MAX_TRIES: int = Field(default=3)
+    CLIENT_CIRCUIT_FAILURE_THRESHOLD: int = Field(default=5)
+    CLIENT_CIRCUIT_RESET_TIMEOUT: int = Field(default=30)
+    # Общий пул соединений клиентов внешних API
+    HTTP_POOL_LIMIT: int = Field(default=100)
+    HTTP_POOL_LIMIT_PER_HOST: int = Field(default=20)
+    HTTP_DNS_CACHE_TTL: int = Field(default=60 * 5)
+    HTTP_KEEPALIVE_TIMEOUT: float = Field(default=30)
+    # Общий кеш: L1 в памяти процесса, L2 в Redis, если указан REDIS_URL
+    REDIS_URL: str | None = Field(default=None)
+    CACHE_L1_SIZE: int = Field(default=1024)
+    CACHE_DEFAULT_TTL: int = Field(default=60 * 10)
+    # Кеш результатов поиска аниме в боте
+    SEARCH_CACHE_TTL: int = Field(default=60 * 10)
     SETTINGS_ID: str | None = Field(default=None)
     BASIC_AUTH_LOGIN: str | None = Field(default='')
     BASIC_AUTH_PASSWORD: str | None = Field(default='')
@@ -1,3 +1,5 @@
 import contextvars
 
 rabbitmq_client = contextvars.ContextVar('rabbitmq_client')
+# Отчет о текущем запуске задачи уведомлений, src.jobs.report.JobRunReport
+job_report = contextvars.ContextVar('job_report', default=None)
@@ -4,3 +4,11 @@ from enum import StrEnum
 class MangaStatus(StrEnum):
     airing = 'AIRING'
     ended = 'ENDED'
+
+
+class OutboxStatus(StrEnum):
+    pending = 'PENDING'
+    published = 'PUBLISHED'
+    sending = 'SENDING'
+    delivered = 'DELIVERED'
+    failed = 'FAILED'
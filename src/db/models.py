@@ -1,5 +1,7 @@
+import os
+import socket
 from collections.abc import Sequence
-from datetime import datetime
+from datetime import datetime, time, timedelta
 from typing import Type, Self
 from uuid import UUID, uuid4
 
@@ -13,6 +15,9 @@ from sqlalchemy import (
     Text,
     TIMESTAMP,
     Index,
+    Boolean,
+    Time,
+    update,
 )
 from sqlalchemy import String
 from sqlalchemy.dialects.postgresql import JSONB
@@ -24,7 +29,7 @@ from sqlalchemy.orm import relationship
 
 from src.config import Config
 from src.db import enums
-from src.enums import Currency
+from src.enums import Currency, SubscriptionType
 
 
 class Base(DeclarativeBase):
@@ -84,6 +89,77 @@ class Base(DeclarativeBase):
         return result
 
 
+# Идентификатор процесса, который держит аренду строки
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+
+class ClaimMixin:
+    """
+    Аренда строк на время обработки вместо блокировки на всю транзакцию.
+    Несколько реплик jobs.py делят работу, не дожидаясь друг друга
+    """
+
+    id: Mapped[int]
+    claimed_until: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    claimed_by: Mapped[str] = mapped_column(String(), nullable=True)
+
+    @classmethod
+    async def claim(
+        cls,
+        session: AsyncSession,
+        *where,
+        after_id: int = 0,
+        limit: int = Config.CLAIM_BATCH_SIZE,
+        lease: int = Config.CLAIM_LEASE,
+    ) -> list[int]:
+        """
+        Арендует до limit свободных строк с id > after_id, занятые другими
+        процессами пропускаются. Свою аренду процесс продлевает
+
+        :param lease: Длительность аренды в секундах
+        :return: id арендованных строк по возрастанию
+        """
+        claimable = (
+            select(cls.id)
+            .where(
+                *where,
+                cls.id > after_id,
+                cls.claimed_until.is_(None)
+                | (cls.claimed_until < func.now())
+                | (cls.claimed_by == WORKER_ID),
+            )
+            .order_by(cls.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        query = (
+            update(cls)
+            .where(cls.id.in_(claimable.scalar_subquery()))
+            .values(
+                claimed_until=func.now() + timedelta(seconds=lease),
+                claimed_by=WORKER_ID,
+            )
+            .returning(cls.id)
+            .execution_options(synchronize_session=False)
+        )
+        ids = (await session.scalars(query)).all()
+        await session.commit()
+
+        return sorted(ids)
+
+    @classmethod
+    async def get_claimed(cls, session: AsyncSession, id: int) -> Self | None:
+        """Строка, если аренда еще у текущего процесса"""
+        query = select(cls).where(
+            cls.id == id,
+            cls.claimed_by == WORKER_ID,
+            cls.claimed_until > func.now(),
+        )
+        return (await session.scalars(query)).one_or_none()
+
+
 class User(Base):
     __tablename__ = 'user'
 
@@ -96,6 +172,13 @@ class User(Base):
     )
     sessions: Mapped[list['UserSession']] = relationship(back_populates='user')
     image_url: Mapped[str] = mapped_column(Text(), nullable=True)
+    # None - используется глобальная настройка NOTIFICATION_DIGEST_ENABLED
+    digest_enabled: Mapped[bool] = mapped_column(Boolean(), nullable=True)
+    # IANA имя часового пояса, None - NOTIFICATION_TIMEZONE
+    timezone: Mapped[str] = mapped_column(String(), nullable=True)
+    # Тихие часы по времени пользователя, None - QUIET_HOURS_START/QUIET_HOURS_END
+    quiet_hours_start: Mapped[time] = mapped_column(Time(), nullable=True)
+    quiet_hours_end: Mapped[time] = mapped_column(Time(), nullable=True)
 
 
 class Subscription(Base):
@@ -107,7 +190,11 @@ class Subscription(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey('user.id'))
     user: Mapped['User'] = relationship(back_populates='subscriptions')
 
-    __table_args__ = (UniqueConstraint('anime_id', 'user_id', name='_anime_user_uc'),)
+    __table_args__ = (
+        UniqueConstraint('anime_id', 'user_id', name='_anime_user_uc'),
+        # Пагинация подписчиков при рассылке
+        Index('subscription_anime_id_id_idx', 'anime_id', 'id'),
+    )
 
     @classmethod
     async def list_by_user_id(
@@ -133,7 +220,11 @@ class SubscriptionManga(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey('user.id'))
     user: Mapped['User'] = relationship(back_populates='subscriptions_manga')
 
-    __table_args__ = (UniqueConstraint('manga_id', 'user_id', name='_manga_user_uc'),)
+    __table_args__ = (
+        UniqueConstraint('manga_id', 'user_id', name='_manga_user_uc'),
+        # Пагинация подписчиков при рассылке
+        Index('subscriptionmanga_manga_id_id_idx', 'manga_id', 'id'),
+    )
 
     @classmethod
     async def list_by_user_id(
@@ -150,12 +241,14 @@ class SubscriptionManga(Base):
         return result.all()
 
 
-class Anime(Base):
+class Anime(ClaimMixin, Base):
     __tablename__ = 'anime'
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String())
     image_url: Mapped[str] = mapped_column(Text(), nullable=True)
+    # file_id постера в телеграме после первой успешной отправки
+    image_file_id: Mapped[str] = mapped_column(Text(), nullable=True)
     site_url: Mapped[str] = mapped_column(Text(), nullable=True)
     external_id: Mapped[str] = mapped_column(String(), unique=True)
     next_air_at: Mapped[datetime] = mapped_column(
@@ -169,12 +262,14 @@ class Anime(Base):
     subscriptions: Mapped[list['Subscription']] = relationship(back_populates='anime')
 
 
-class Manga(Base):
+class Manga(ClaimMixin, Base):
     __tablename__ = 'manga'
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String())
     image_url: Mapped[str] = mapped_column(Text(), nullable=True)
+    # file_id постера в телеграме после первой успешной отправки
+    image_file_id: Mapped[str] = mapped_column(Text(), nullable=True)
     site_url: Mapped[str] = mapped_column(Text(), nullable=True)
     external_id: Mapped[str] = mapped_column(String(), unique=True)
     latest_chapter: Mapped[int] = mapped_column(Integer())
@@ -187,6 +282,110 @@ class Manga(Base):
     status: Mapped[enums.MangaStatus] = mapped_column(
         String(), default=enums.MangaStatus.airing
     )
+    # Рассчитывается по периодичности выхода глав, None - проверить при первом запуске
+    next_check_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    chapters: Mapped[list['MangaChapter']] = relationship(back_populates='manga')
+
+
+class MangaChapter(Base):
+    __tablename__ = 'mangachapter'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    manga_id: Mapped[int] = mapped_column(ForeignKey('manga.id'))
+    manga: Mapped['Manga'] = relationship(back_populates='chapters')
+    chapter: Mapped[int] = mapped_column(Integer())
+    detected_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index('mangachapter_manga_detected_idx', 'manga_id', 'detected_at'),
+    )
+
+    @classmethod
+    async def list_release_times(
+        cls, session: AsyncSession, manga_id: int, limit: int
+    ) -> list[datetime]:
+        """Время обнаружения последних limit глав по возрастанию"""
+        query = (
+            select(cls.detected_at)
+            .where(cls.manga_id == manga_id)
+            .order_by(cls.detected_at.desc())
+            .limit(limit)
+        )
+        result = await session.scalars(query)
+
+        return sorted(result.all())
+
+
+class NotificationOutbox(Base):
+    __tablename__ = 'notificationoutbox'
+
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    chat_id: Mapped[str] = mapped_column(String())
+    text: Mapped[str] = mapped_column(Text())
+    photo: Mapped[str] = mapped_column(Text(), nullable=True)
+    # Аниме/манга, чей постер отправляется, чтобы взять актуальный file_id
+    entity_type: Mapped[SubscriptionType] = mapped_column(String(), nullable=True)
+    entity_id: Mapped[int] = mapped_column(Integer(), nullable=True)
+    status: Mapped[enums.OutboxStatus] = mapped_column(
+        String(), default=enums.OutboxStatus.pending
+    )
+    attempts: Mapped[int] = mapped_column(Integer(), default=0)
+    # Не отправлять раньше, чем закончатся тихие часы получателя
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    published_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # До какого времени сообщение отправляет воркер, забравший его
+    sending_until: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    delivered_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        Index('notificationoutbox_status_idx', 'status'),
+        Index('notificationoutbox_status_available_idx', 'status', 'available_at'),
+    )
+
+
+class JobRun(Base):
+    __tablename__ = 'job_run'
+
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    job_name: Mapped[str] = mapped_column(String())
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    error: Mapped[str] = mapped_column(Text(), nullable=True)
+    titles_scanned: Mapped[int] = mapped_column(Integer(), default=0)
+    titles_changed: Mapped[int] = mapped_column(Integer(), default=0)
+    messages_sent: Mapped[int] = mapped_column(Integer(), default=0)
+    messages_failed: Mapped[int] = mapped_column(Integer(), default=0)
+    messages_queued: Mapped[int] = mapped_column(Integer(), default=0)
+    # Сервис -> количество запросов, ошибок и задержки в секундах
+    external_calls: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Этап -> время в секундах
+    stages: Mapped[dict] = mapped_column(JSONB, default=dict)
+
+    __table_args__ = (
+        Index('job_run_job_name_started_at_idx', 'job_name', 'started_at'),
+    )
+
+    @classmethod
+    async def list_recent(
+        cls, session: AsyncSession, job_name: str | None = None, limit: int = 20
+    ) -> Sequence[Self]:
+        query = select(cls).order_by(cls.started_at.desc()).limit(limit)
+
+        if job_name:
+            query = query.where(cls.job_name == job_name)
+
+        result = await session.scalars(query)
+        return result.all()
 
 
 class UserSession(Base):
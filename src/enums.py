@@ -6,6 +6,11 @@ class SubscriptionType(StrEnum):
     manga = 'MANGA'
 
 
+class DigestFormat(StrEnum):
+    album = 'ALBUM'
+    text = 'TEXT'
+
+
 class Currency(StrEnum):
     AED = 'AED'
     AFN = 'AFN'
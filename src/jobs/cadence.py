@@ -0,0 +1,45 @@
+import datetime
+import itertools
+import statistics
+
+from src.config import Config
+
+# Главы часто выходят немного раньше медианного интервала
+EXPECTED_RELEASE_FACTOR = 0.9
+# Доля просрочки, через которую будет следующая проверка
+BACKOFF_FACTOR = 0.25
+
+
+def get_next_check_at(
+    release_times: list[datetime.datetime],
+    now: datetime.datetime,
+    min_interval: int = Config.NOTIFICATION_PERIOD_MANGA,
+    max_interval: int = Config.MANGA_MAX_CHECK_INTERVAL,
+) -> datetime.datetime:
+    """
+    Время следующей проверки манги по истории выхода глав.
+    До ожидаемого выхода главы не проверяем, после него проверяем тем реже,
+    чем дольше новой главы нет
+
+    :param release_times: Время выхода последних глав по возрастанию
+    :param min_interval: Минимальный интервал проверки в секундах
+    :param max_interval: Максимальный интервал проверки в секундах
+    """
+    min_delta = datetime.timedelta(seconds=min_interval)
+    max_delta = datetime.timedelta(seconds=max_interval)
+
+    if not release_times:
+        return now + min_delta
+
+    overdue_since = release_times[-1]
+    intervals = [b - a for a, b in itertools.pairwise(release_times)]
+
+    if intervals:
+        overdue_since += statistics.median(intervals) * EXPECTED_RELEASE_FACTOR
+
+        if overdue_since > now + min_delta:
+            return min(overdue_since, now + max_delta)
+
+    backoff = (now - overdue_since) * BACKOFF_FACTOR
+
+    return now + min(max(backoff, min_delta), max_delta)
@@ -0,0 +1,151 @@
+import collections
+import contextlib
+import dataclasses
+import datetime
+import logging
+import time
+import typing
+from functools import wraps
+
+from src import context
+from src.db import models, Session
+
+log = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class ExternalCallStats:
+    count: int = 0
+    errors: int = 0
+    total_latency: float = 0
+    max_latency: float = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_latency': round(self.total_latency / self.count, 4)
+            if self.count
+            else 0,
+            'max_latency': round(self.max_latency, 4),
+        }
+
+
+@dataclasses.dataclass
+class JobRunReport:
+    """
+    Статистика одного запуска задачи уведомлений.
+    Передается через contextvar, поэтому клиенты и рассыльщик
+    дописывают в нее без явной передачи
+    """
+
+    job_name: str
+    started_at: datetime.datetime = dataclasses.field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
+    titles_scanned: int = 0
+    titles_changed: int = 0
+    messages_sent: int = 0
+    messages_failed: int = 0
+    # Записано в outbox: очередь или отложено из-за тихих часов
+    messages_queued: int = 0
+    external_calls: dict[str, ExternalCallStats] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(ExternalCallStats)
+    )
+    # Этап -> суммарное время в секундах
+    stages: dict[str, float] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(float)
+    )
+
+    def add_external_call(self, service: str, latency: float, error: bool) -> None:
+        stats = self.external_calls[service]
+        stats.count += 1
+        stats.errors += int(error)
+        stats.total_latency += latency
+        stats.max_latency = max(stats.max_latency, latency)
+
+    def to_model(
+        self, finished_at: datetime.datetime, error: str | None
+    ) -> models.JobRun:
+        return models.JobRun(
+            job_name=self.job_name,
+            started_at=self.started_at,
+            finished_at=finished_at,
+            error=error,
+            titles_scanned=self.titles_scanned,
+            titles_changed=self.titles_changed,
+            messages_sent=self.messages_sent,
+            messages_failed=self.messages_failed,
+            messages_queued=self.messages_queued,
+            external_calls={
+                service: stats.to_dict()
+                for service, stats in self.external_calls.items()
+            },
+            stages={stage: round(spent, 4) for stage, spent in self.stages.items()},
+        )
+
+
+def get_current() -> JobRunReport | None:
+    return context.job_report.get()
+
+
+def increment(field: str, value: int = 1) -> None:
+    report = get_current()
+    if report:
+        setattr(report, field, getattr(report, field) + value)
+
+
+@contextlib.asynccontextmanager
+async def stage(name: str) -> typing.AsyncIterator[None]:
+    """
+    Считает время этапа. Параллельные этапы суммируются,
+    поэтому сумма может быть больше длительности запуска
+    """
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        report = get_current()
+        if report:
+            report.stages[name] += time.monotonic() - started
+
+
+def with_job_report(job_name: str):
+    """
+    Сохраняет отчет о каждом запуске корутины в таблицу job_run
+    """
+
+    def _with_job_report(coro: typing.Callable):
+        @wraps(coro)
+        async def _wrapper(*args, **kwargs):
+            report = JobRunReport(job_name=job_name)
+            token = context.job_report.set(report)
+            error = None
+
+            try:
+                return await coro(*args, **kwargs)
+            except Exception as e:
+                error = repr(e)
+                raise
+            finally:
+                context.job_report.reset(token)
+                await _save_report(report=report, error=error)
+
+        return _wrapper
+
+    return _with_job_report
+
+
+async def _save_report(report: JobRunReport, error: str | None) -> None:
+    try:
+        async with Session() as session:
+            session.add(
+                report.to_model(
+                    finished_at=datetime.datetime.now(datetime.timezone.utc),
+                    error=error,
+                )
+            )
+            await session.commit()
+    except Exception:
+        # Отчет не должен ронять задачу
+        log.exception('Не удалось сохранить отчет о запуске %s', report.job_name)
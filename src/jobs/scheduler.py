@@ -0,0 +1,143 @@
+import asyncio
+import datetime
+import heapq
+import logging
+import typing
+
+from sqlalchemy import select
+
+from src.config import Config
+from src.db import models, Session
+
+log = logging.getLogger(__name__)
+
+# anime_ids -> anime_id: следующий выход серии (None - повторить проверку)
+AiredHandler = typing.Callable[
+    [list[int]], typing.Awaitable[dict[int, datetime.datetime | None]]
+]
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class AiringScheduler:
+    """
+    Куча таймеров по Anime.next_air_at.
+    Просыпается к выходу ближайшей серии, вызывает handler для всех наступивших
+    аниме пачкой и перевзводит таймер по новому nextEpisodeAt из ответа
+    """
+
+    def __init__(
+        self,
+        handler: AiredHandler,
+        delay: int = Config.ANIME_SCHEDULER_DELAY,
+        retry_delay: int = Config.ANIME_SCHEDULER_RETRY_DELAY,
+        resync_period: int = Config.ANIME_SCHEDULER_RESYNC_PERIOD,
+        max_wait: int = Config.ANIME_SCHEDULER_MAX_WAIT,
+    ) -> None:
+        self._handler = handler
+        self._delay = datetime.timedelta(seconds=delay)
+        self._retry_delay = datetime.timedelta(seconds=retry_delay)
+        self._resync_period = datetime.timedelta(seconds=resync_period)
+        self._max_wait = datetime.timedelta(seconds=max_wait)
+        self._heap: list[tuple[datetime.datetime, int]] = []
+        # Актуальное время срабатывания, устаревшие записи кучи пропускаются
+        self._fire_at: dict[int, datetime.datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._resync_at = _now()
+
+    def schedule(self, anime_id: int, fire_at: datetime.datetime) -> None:
+        if self._fire_at.get(anime_id) == fire_at:
+            return
+
+        self._fire_at[anime_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, anime_id))
+        self._wakeup.set()
+
+    def schedule_air(self, anime_id: int, air_at: datetime.datetime | None) -> None:
+        if air_at is None:
+            self._fire_at.pop(anime_id, None)
+            return
+
+        self.schedule(anime_id, air_at + self._delay)
+
+    def _pop_due(self, now: datetime.datetime) -> list[int]:
+        anime_ids = []
+
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, anime_id = heapq.heappop(self._heap)
+
+            if self._fire_at.get(anime_id) != fire_at:
+                continue
+
+            del self._fire_at[anime_id]
+            anime_ids.append(anime_id)
+
+        return anime_ids
+
+    async def resync(self) -> None:
+        async with Session() as session:
+            # Выходы серий старше max_wait не планируются: таймер сработал бы
+            # сразу и уведомил без подтверждения шикимори
+            query = select(models.Anime.id, models.Anime.next_air_at).where(
+                models.Anime.next_air_at > _now() - self._max_wait,
+                models.Anime.last_notification_at.is_(None)
+                | (models.Anime.last_notification_at < models.Anime.next_air_at),
+            )
+            rows = (await session.execute(query)).all()
+
+        for anime_id, next_air_at in rows:
+            if anime_id not in self._fire_at:
+                self.schedule_air(anime_id, next_air_at)
+
+        self._resync_at = _now() + self._resync_period
+        log.debug('Airing scheduler resync, scheduled=%s', len(self._fire_at))
+
+    async def _fire(self, anime_ids: list[int]) -> None:
+        log.info('Airing scheduler fire anime_ids=%s', anime_ids)
+
+        retry_at = _now() + self._retry_delay
+
+        try:
+            next_air_at_by_id = await self._handler(anime_ids)
+        except Exception:
+            log.exception('Airing scheduler handler error anime_ids=%s', anime_ids)
+            next_air_at_by_id = dict.fromkeys(anime_ids)
+
+        # Аниме без следующей серии больше не отслеживаются,
+        # новые подхватит resync
+        for anime_id, next_air_at in next_air_at_by_id.items():
+            if next_air_at is None:
+                self.schedule(anime_id, retry_at)
+            else:
+                self.schedule_air(anime_id, next_air_at)
+
+    async def run(self) -> None:
+        while True:
+            now = _now()
+
+            if now >= self._resync_at:
+                try:
+                    await self.resync()
+                except Exception:
+                    log.exception('Airing scheduler resync error')
+                    self._resync_at = now + self._retry_delay
+
+            anime_ids = self._pop_due(now)
+            if anime_ids:
+                await self._fire(anime_ids)
+                continue
+
+            wake_at = self._resync_at
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=max((wake_at - _now()).total_seconds(), 0),
+                )
+            except TimeoutError:
+                pass
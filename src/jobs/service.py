@@ -1,15 +1,25 @@
 import datetime
+import logging
 
 from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
 
-from src.clients.currency import CurrencyExchangeClient
+from src.clients.currency import (
+    CurrencyExchangeClient,
+    ExchangeResponseError,
+    ExchangeResponseSuccess,
+)
+from src.clients.registry import clients
 from src.config import Config
 from src.db import models, Session
 from src.enums import Currency
+from src.jobs.utils import map_as_completed
+
+log = logging.getLogger(__name__)
 
 
 async def refresh_currency_rates():
-    currency_client = CurrencyExchangeClient()
+    currency_client = clients.get(CurrencyExchangeClient)
 
     currency_exchanges = []
 
@@ -17,33 +27,64 @@ async def refresh_currency_rates():
         settings = await models.Settings.get(id=Config.SETTINGS_ID, session=session)
 
     exchange_rates = await currency_client.get_exchange(currency=Currency.USD)
+    if isinstance(exchange_rates, ExchangeResponseError):
+        log.error('Ошибка при получении курсов USD: %s', exchange_rates.message)
+        return
+
     last_update_at = datetime.datetime.fromtimestamp(
         exchange_rates.time_last_update_unix
     )
     if last_update_at <= settings.currency_update_at:
         return
 
-    for currency in Currency.active_currencies():
-        currency: Currency
-        exchange_rates = await currency_client.get_exchange(currency=currency)
+    exchange_rates_by_currency = {Currency.USD: exchange_rates}
+
+    async for currency, exchange_rates, error in map_as_completed(
+        lambda item: currency_client.get_exchange(currency=item),
+        [
+            currency
+            for currency in Currency.active_currencies()
+            if currency not in exchange_rates_by_currency
+        ],
+        concurrency=Config.CURRENCY_EXCHANGE_CONCURRENCY,
+    ):
+        if isinstance(exchange_rates, ExchangeResponseError):
+            error = exchange_rates
+
+        if error:
+            log.error('Ошибка при получении курсов %s: %r', currency, error)
+            continue
 
+        exchange_rates_by_currency[currency] = exchange_rates
+
+    for currency, exchange_rates in exchange_rates_by_currency.items():
+        exchange_rates: ExchangeResponseSuccess
         currency_exchanges.append(
-            models.CurrencyExchange(
-                date_at=datetime.datetime.fromtimestamp(
+            {
+                'date_at': datetime.datetime.fromtimestamp(
                     exchange_rates.time_last_update_unix
                 ),
-                currency=currency,
-                rates=exchange_rates.conversion_rates,
-            )
+                'currency': currency,
+                'rates': exchange_rates.conversion_rates,
+            }
         )
 
     async with Session() as session:
-        update_settings_query = (
-            update(models.Settings)
-            .where(models.Settings.id == Config.SETTINGS_ID)
-            .values(currency_update_at=last_update_at)
+        # Курсы, сохраненные в прошлый неудачный запуск, пропускаются
+        await session.execute(
+            insert(models.CurrencyExchange)
+            .values(currency_exchanges)
+            .on_conflict_do_nothing(index_elements=['currency', 'date_at'])
         )
-        await session.execute(update_settings_query)
 
-        session.add_all(currency_exchanges)
+        # Дата обновления сдвигается, только когда есть все курсы,
+        # иначе недостающие запросятся в следующий запуск
+        if len(exchange_rates_by_currency) == len(Currency.active_currencies()):
+            update_settings_query = (
+                update(models.Settings)
+                .where(models.Settings.id == Config.SETTINGS_ID)
+                .values(currency_update_at=last_update_at)
+            )
+            await session.execute(update_settings_query)
+
         await session.commit()
@@ -1,167 +1,399 @@
 import datetime
 import logging
+from collections.abc import Sequence
 
 from sqlalchemy import select, func
-from sqlalchemy.orm import joinedload
-from telegram import Bot
 
-from src.clients import shikimori
+from src.clients.shikimori import ANIME_SCHEDULE_QUERY, shikimori_client
 from src.clients.manga import MangaUpdatesClient
+from src.clients.registry import clients
 from src.config import Config
 from src.db import models, enums, Session
-from src.jobs import service
-from src.jobs.utils import periodic_task_run
+from src.jobs import service, cadence, report
+from src.jobs.utils import periodic_task_run, chunked, map_as_completed
+from src.notifications import digest, outbox
+from src.notifications.digest import DigestCollector
 
 log = logging.getLogger(__name__)
 
 
-manga_client = MangaUpdatesClient()
-
-
-def is_valid_time_for_notification() -> bool:
-    return datetime.datetime.now().time() > datetime.time(18, 0)
-
-
 @periodic_task_run(sleep=Config.CURRENCY_EXCHANGE_GET_PERIOD)
 async def get_currency_exchange_rates():
     await service.refresh_currency_rates()
 
 
+@periodic_task_run(sleep=Config.OUTBOX_PUBLISH_PERIOD)
+async def process_notification_outbox():
+    if Config.NOTIFICATION_OUTBOX_ENABLED:
+        await outbox.publish_pending()
+    else:
+        # Без очереди в outbox лежат только отложенные из-за тихих часов
+        await digest.deliver_deferred()
+
+
 @periodic_task_run(sleep=Config.NOTIFICATION_PERIOD_ANIME)
+@report.with_job_report('check_notifications_anime')
 async def check_notifications_anime():
-    if not is_valid_time_for_notification():
-        return
-
-    async with Session() as session:
-        query = (
-            select(models.Anime)
-            .where(
-                func.DATE(models.Anime.next_air_at) == datetime.date.today(),
-                (
+    # Время отправки определяют тихие часы подписчиков (windows.get_available_at)
+    collector = DigestCollector()
+    after_id = 0
+
+    while True:
+        async with report.stage('claim'):
+            async with Session() as session:
+                anime_ids = await models.Anime.claim(
+                    session,
+                    func.DATE(models.Anime.next_air_at) == datetime.date.today(),
                     (
-                        func.DATE(models.Anime.last_notification_at)
-                        != datetime.date.today()
-                    )
-                    | (models.Anime.last_notification_at.is_(None))
-                ),
-            )
-            .options(
-                joinedload(models.Anime.subscriptions).joinedload(
-                    models.Subscription.user
+                        (
+                            func.DATE(models.Anime.last_notification_at)
+                            != datetime.date.today()
+                        )
+                        | (models.Anime.last_notification_at.is_(None))
+                    ),
+                    after_id=after_id,
                 )
-            )
-        )
 
-        animes = (await session.scalars(query)).unique().all()
+        if not anime_ids:
+            break
+
+        report.increment('titles_scanned', len(anime_ids))
+        after_id = anime_ids[-1]
+        await _notify_animes_today(anime_ids=anime_ids, collector=collector)
+
+    await _flush_notifications(collector=collector)
+
+
+async def _flush_notifications(collector: DigestCollector) -> None:
+    async with report.stage('notify'):
+        await collector.flush()
+
+        if Config.NOTIFICATION_OUTBOX_ENABLED:
+            await outbox.publish_pending()
+
+
+async def _notify_animes_today(
+    anime_ids: list[int], collector: DigestCollector
+) -> None:
+    async with report.stage('load'):
+        animes = await _load_animes(anime_ids=anime_ids)
+
+    async with report.stage('shikimori'):
+        shikimori_animes = await _fetch_shikimori_animes(
+            external_ids=[anime.external_id for anime in animes]
+        )
 
     for anime in animes:
-        async with Session() as session:
-            query = (
-                select(models.Anime)
-                .with_for_update()
-                .where(models.Anime.id == anime.id)
-            )
-            anime_locked = (await session.scalars(query)).one()
+        async with Session() as session, report.stage('update'):
+            anime_claimed = await models.Anime.get_claimed(session=session, id=anime.id)
+
+            if not anime_claimed:
+                # Аренда истекла и строку забрал другой процесс
+                continue
 
             if (
-                anime_locked.last_notification_at
-                and anime_locked.last_notification_at.date() == datetime.date.today()
+                anime_claimed.last_notification_at
+                and anime_claimed.last_notification_at.date() == datetime.date.today()
             ):
                 continue
 
-            shikimori_response = None
-            shikimori_anime = None
+            shikimori_anime = shikimori_animes.get(anime.external_id)
+
+            if shikimori_anime:
+                _update_anime(anime=anime_claimed, shikimori_anime=shikimori_anime)
 
-            try:
-                shikimori_response = await shikimori.send_shikimori(
-                    ids=[anime.external_id]
+            anime_claimed.last_notification_at = datetime.datetime.now()
+            report.increment('titles_changed')
+
+            text = f'Вышла новая серия аниме: {anime.name}\n{anime.site_url}'
+
+            if Config.NOTIFICATION_OUTBOX_ENABLED:
+                await outbox.add_messages(
+                    session=session, entity=anime_claimed, text=text
                 )
-            except Exception:
-                log.exception('Ошибка при запросе в шикимори anime_id=%s', anime.id)
-
-            if shikimori_response:
-                try:
-                    shikimori_anime = shikimori_response['animes'][0]
-                except KeyError:
-                    log.error('Ошибка в ответе шикимори: %s', shikimori_response)
-
-                if shikimori_anime:
-                    anime_locked.next_air_at = datetime.datetime.fromisoformat(
-                        shikimori_anime['nextEpisodeAt']
-                    )
-                    anime_locked.episodes_aired = shikimori_anime['episodesAired']
-                    anime_locked.episodes_number = shikimori_anime['episodes']
 
-            anime_locked.last_notification_at = datetime.datetime.now()
             await session.commit()
 
-        for subscription in anime.subscriptions:
-            await _send_telegram_message(
-                user_id=subscription.user.telegram_id,
-                text=f'Вышла новая серия аниме: {anime.name}\n{anime.site_url}',
-                photo=anime.image_url,
-            )
+        if not Config.NOTIFICATION_OUTBOX_ENABLED:
+            collector.add(entity=anime, text=text)
 
 
 @periodic_task_run(sleep=Config.NOTIFICATION_PERIOD_MANGA)
+@report.with_job_report('check_notifications_manga')
 async def check_notifications_manga():
-    if not is_valid_time_for_notification():
-        return
+    collector = DigestCollector()
+    after_id = 0
+
+    while True:
+        async with report.stage('claim'):
+            async with Session() as session:
+                manga_ids = await models.Manga.claim(
+                    session,
+                    models.Manga.status == enums.MangaStatus.airing,
+                    models.Manga.next_check_at.is_(None)
+                    | (models.Manga.next_check_at <= func.now()),
+                    after_id=after_id,
+                )
 
-    async with Session() as session:
-        query = (
-            select(models.Manga)
-            .where(
-                models.Manga.status == enums.MangaStatus.airing,
+        if not manga_ids:
+            break
+
+        report.increment('titles_scanned', len(manga_ids))
+        after_id = manga_ids[-1]
+        await _check_manga_list(manga_ids=manga_ids, collector=collector)
+
+    await _flush_notifications(collector=collector)
+
+
+async def _check_manga_list(manga_ids: list[int], collector: DigestCollector) -> None:
+    async with report.stage('load'):
+        async with Session() as session:
+            query = select(models.Manga).where(models.Manga.id.in_(manga_ids))
+            manga_list = (await session.scalars(query)).all()
+
+    async for manga, series, error in map_as_completed(
+        lambda item: clients.get(MangaUpdatesClient).get_series(
+            series_id=item.external_id
+        ),
+        manga_list,
+        concurrency=Config.MANGA_UPDATES_CONCURRENCY,
+    ):
+        need_notification = False
+
+        if error:
+            log.error(
+                'Ошибка при запросе в MangaUpdate manga_id=%s',
+                manga.id,
+                exc_info=error,
             )
-            .options(
-                joinedload(models.Manga.subscriptions).joinedload(
-                    models.SubscriptionManga.user
+            continue
+
+        async with Session() as session, report.stage('update'):
+            manga_claimed = await models.Manga.get_claimed(session=session, id=manga.id)
+
+            if not manga_claimed:
+                # Аренда истекла и строку забрал другой процесс
+                continue
+
+            if manga_claimed.status != enums.MangaStatus.airing:
+                continue
+
+            if series.completed:
+                manga_claimed.status = enums.MangaStatus.ended
+
+            now = datetime.datetime.now(datetime.timezone.utc)
+
+            if manga_claimed.latest_chapter < series.latest_chapter:
+                manga_claimed.last_notification_at = now
+                manga_claimed.latest_chapter = series.latest_chapter
+                session.add(
+                    models.MangaChapter(
+                        manga_id=manga_claimed.id,
+                        chapter=series.latest_chapter,
+                        detected_at=now,
+                    )
                 )
+                await session.flush()
+                need_notification = True
+                report.increment('titles_changed')
+
+            release_times = await models.MangaChapter.list_release_times(
+                session=session,
+                manga_id=manga_claimed.id,
+                limit=Config.MANGA_CADENCE_HISTORY,
+            )
+            manga_claimed.next_check_at = cadence.get_next_check_at(
+                release_times=release_times
+                or [manga_claimed.last_notification_at or manga_claimed.created_at],
+                now=now,
             )
-        )
 
-        manga_list = (await session.scalars(query)).unique().all()
+            text = f'Вышла новая глава манги: {manga.name}\n{manga.site_url}'
 
-    for manga in manga_list:
-        need_notification = False
+            if need_notification and Config.NOTIFICATION_OUTBOX_ENABLED:
+                await outbox.add_messages(
+                    session=session, entity=manga_claimed, text=text
+                )
+
+            await session.commit()
+
+        if need_notification and not Config.NOTIFICATION_OUTBOX_ENABLED:
+            collector.add(entity=manga, text=text)
+
+
+@report.with_job_report('notify_aired_animes')
+async def notify_aired_animes(
+    anime_ids: list[int],
+) -> dict[int, datetime.datetime | None]:
+    """
+    Обновляет вышедшие аниме из шикимори и уведомляет подписчиков,
+    если шикимори подтвердил выход новой серии
 
+    :return: anime_id -> следующий выход серии, None если шикимори еще не обновился
+        и проверку нужно повторить. Аниме без следующей серии в ответ не попадают
+    """
+    async with report.stage('claim'):
         async with Session() as session:
-            query = (
-                select(models.Manga)
-                .with_for_update()
-                .where(models.Manga.id == manga.id)
+            anime_ids = await models.Anime.claim(
+                session, models.Anime.id.in_(anime_ids), limit=len(anime_ids)
             )
-            manga_locked = (await session.scalars(query)).one()
 
-            if manga_locked.status != enums.MangaStatus.airing:
+    report.increment('titles_scanned', len(anime_ids))
+
+    async with report.stage('load'):
+        animes = await _load_animes(anime_ids=anime_ids)
+
+    async with report.stage('shikimori'):
+        shikimori_animes = await _fetch_shikimori_animes(
+            external_ids=[anime.external_id for anime in animes]
+        )
+
+    collector = DigestCollector()
+    next_air_at_by_id = {}
+    postpone_window = datetime.timedelta(seconds=Config.ANIME_SCHEDULER_POSTPONE_WINDOW)
+
+    for anime in animes:
+        async with Session() as session, report.stage('update'):
+            anime_claimed = await models.Anime.get_claimed(session=session, id=anime.id)
+
+            if not anime_claimed:
+                # Аренда истекла и строку забрал другой процесс
                 continue
 
-            try:
-                series = await manga_client.get_series(series_id=manga.external_id)
-            except Exception:
-                log.exception('Ошибка при запросе в MangaUpdate manga_id=%s', manga.id)
+            aired_at = anime_claimed.next_air_at
+            now = datetime.datetime.now(datetime.timezone.utc)
+
+            if not aired_at or (
+                anime_claimed.last_notification_at
+                and anime_claimed.last_notification_at >= aired_at
+            ):
+                # Уже уведомили, например, периодическая задача или другой процесс
+                if aired_at and aired_at > now:
+                    next_air_at_by_id[anime.id] = aired_at
                 continue
 
-            if series.completed:
-                manga_locked.status = enums.MangaStatus.ended
+            shikimori_anime = shikimori_animes.get(anime.external_id)
+            is_new_episode = bool(shikimori_anime) and _update_anime(
+                anime=anime_claimed, shikimori_anime=shikimori_anime
+            )
 
-            if manga_locked.latest_chapter < series.latest_chapter:
-                manga_locked.last_notification_at = datetime.datetime.now()
-                manga_locked.latest_chapter = series.latest_chapter
-                need_notification = True
+            if not is_new_episode:
+                shikimori_next_air_at = anime_claimed.next_air_at
+
+                if (
+                    shikimori_next_air_at
+                    and aired_at < shikimori_next_air_at < aired_at + postpone_window
+                ):
+                    # Выход серии перенесли
+                    await session.commit()
+                    next_air_at_by_id[anime.id] = shikimori_next_air_at
+                    continue
+
+                # Шикимори может сдвинуть nextEpisodeAt на следующий выход раньше,
+                # чем увеличит episodesAired. Пока серия не подтверждена,
+                # next_air_at остается прежним, проверка повторяется
+                anime_claimed.next_air_at = aired_at
+                await session.commit()
+
+                max_wait = datetime.timedelta(seconds=Config.ANIME_SCHEDULER_MAX_WAIT)
+                if now - aired_at < max_wait:
+                    next_air_at_by_id[anime.id] = None
+                    continue
+
+                anime_claimed.next_air_at = shikimori_next_air_at
+
+                # Без подтверждения уведомляем только на проверке сразу после
+                # окончания ожидания (с запасом на задержку повтора).
+                # Более старые выходы серий устарели, таймер переводится
+                # на следующий выход без уведомления
+                if now - aired_at >= max_wait + 2 * datetime.timedelta(
+                    seconds=Config.ANIME_SCHEDULER_RETRY_DELAY
+                ):
+                    log.warning(
+                        'Устаревший выход серии anime_id=%s next_air_at=%s, '
+                        'не уведомляем',
+                        anime.id,
+                        aired_at,
+                    )
+                    await session.commit()
+                    if shikimori_next_air_at and shikimori_next_air_at > now:
+                        next_air_at_by_id[anime.id] = shikimori_next_air_at
+                    continue
+
+                log.warning(
+                    'Шикимори не подтвердил выход серии anime_id=%s, уведомляем',
+                    anime.id,
+                )
 
-            await session.commit()
+            anime_claimed.last_notification_at = now
+            report.increment('titles_changed')
+            if anime_claimed.next_air_at and anime_claimed.next_air_at > now:
+                next_air_at_by_id[anime.id] = anime_claimed.next_air_at
+
+            text = f'Вышла новая серия аниме: {anime.name}\n{anime.site_url}'
 
-        if need_notification:
-            for subscription in manga.subscriptions:
-                await _send_telegram_message(
-                    user_id=subscription.user.telegram_id,
-                    text=f'Вышла новая глава манги: {manga.name}\n{manga.site_url}',
-                    photo=manga.image_url,
+            if Config.NOTIFICATION_OUTBOX_ENABLED:
+                await outbox.add_messages(
+                    session=session, entity=anime_claimed, text=text
                 )
 
+            await session.commit()
+
+        if not Config.NOTIFICATION_OUTBOX_ENABLED:
+            collector.add(entity=anime, text=text)
+
+    await _flush_notifications(collector=collector)
+
+    return next_air_at_by_id
+
+
+async def _load_animes(anime_ids: list[int]) -> Sequence[models.Anime]:
+    async with Session() as session:
+        query = select(models.Anime).where(models.Anime.id.in_(anime_ids))
+        return (await session.scalars(query)).all()
+
+
+def _update_anime(anime: models.Anime, shikimori_anime: dict) -> bool:
+    """
+    :return: Увеличилось ли количество вышедших серий
+    """
+    episodes_aired = anime.episodes_aired
+
+    anime.next_air_at = (
+        datetime.datetime.fromisoformat(shikimori_anime['nextEpisodeAt'])
+        if shikimori_anime['nextEpisodeAt']
+        else None
+    )
+    anime.episodes_aired = shikimori_anime['episodesAired']
+    anime.episodes_number = shikimori_anime['episodes']
+
+    return anime.episodes_aired > (episodes_aired or 0)
+
+
+async def _fetch_shikimori_animes(external_ids: list[str]) -> dict[str, dict]:
+    """
+    Запрашивает аниме в шикимори пачками по SHIKIMORI_BATCH_SIZE
+
+    :return: Словарь external_id -> аниме из ответа шикимори
+    """
+    shikimori_animes = {}
+
+    for ids in chunked(external_ids, size=Config.SHIKIMORI_BATCH_SIZE):
+        try:
+            shikimori_response = await shikimori_client.get_animes(
+                query=ANIME_SCHEDULE_QUERY, ids=ids, limit=len(ids)
+            )
+        except Exception:
+            log.exception('Ошибка при запросе в шикимори external_ids=%s', ids)
+            continue
+
+        try:
+            animes = shikimori_response['animes']
+        except KeyError:
+            log.error('Ошибка в ответе шикимори: %s', shikimori_response)
+            continue
+
+        for shikimori_anime in animes:
+            shikimori_animes[str(shikimori_anime['id'])] = shikimori_anime
 
-async def _send_telegram_message(user_id: str | int, text: str, photo: str):
-    async with Bot(Config.BOT_TOKEN) as bot:
-        await bot.send_photo(chat_id=user_id, photo=photo, caption=text)
+    return shikimori_animes
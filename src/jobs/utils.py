@@ -6,6 +6,48 @@ from functools import wraps
 log = logging.getLogger(__name__)
 
 
+T = typing.TypeVar('T')
+R = typing.TypeVar('R')
+
+
+def chunked(items: typing.Sequence[T], size: int) -> typing.Iterator[list[T]]:
+    """
+    :param size: Максимальный размер пачки
+    """
+    for index in range(0, len(items), size):
+        yield list(items[index : index + size])
+
+
+async def map_as_completed(
+    func: typing.Callable[[T], typing.Awaitable[R]],
+    items: typing.Iterable[T],
+    concurrency: int,
+) -> typing.AsyncIterator[tuple[T, R | None, Exception | None]]:
+    """
+    Выполняет func для каждого элемента, не больше concurrency одновременно,
+    и отдает результаты по мере готовности
+
+    :return: Кортежи (элемент, результат, исключение)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(item: T) -> tuple[T, R | None, Exception | None]:
+        async with semaphore:
+            try:
+                return item, await func(item), None
+            except Exception as e:
+                return item, None, e
+
+    tasks = [asyncio.create_task(_run(item)) for item in items]
+
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 def periodic_task_run(sleep: int):
     """
     :param sleep: Задержка в секундах
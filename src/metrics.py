@@ -0,0 +1,159 @@
+import dataclasses
+import typing
+
+# Метрики процесса в текстовом формате Prometheus, отдаются на /metrics
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+
+    values = ','.join(f'{name}="{value}"' for name, value in labels)
+    return f'{{{values}}}'
+
+
+@dataclasses.dataclass
+class Metric:
+    name: str
+    description: str
+    type: typing.ClassVar[str]
+
+    _values: dict[tuple[tuple[str, str], ...], float] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list[str]:
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        for labels, value in self._values.items():
+            lines.append(f'{self.name}{_format_labels(labels)} {value}')
+
+        return lines
+
+
+@dataclasses.dataclass
+class Counter(Metric):
+    type: typing.ClassVar[str] = 'counter'
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + value
+
+
+@dataclasses.dataclass
+class Gauge(Metric):
+    type: typing.ClassVar[str] = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[tuple(sorted(labels.items()))] = value
+
+    def clear(self) -> None:
+        """
+        Удаляет значения всех меток, например перед пересчетом в коллекторе
+        """
+        self._values.clear()
+
+
+@dataclasses.dataclass
+class Histogram(Metric):
+    type: typing.ClassVar[str] = 'histogram'
+    buckets: tuple[float, ...] = (
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+    )
+
+    # Метки -> (количество по корзинам, сумма, количество)
+    _observations: dict[tuple[tuple[str, str], ...], tuple[list[int], float, int]] = (
+        dataclasses.field(default_factory=dict, init=False)
+    )
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        counts, total, count = self._observations.get(
+            key, ([0] * len(self.buckets), 0, 0)
+        )
+
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                counts[index] += 1
+
+        self._observations[key] = (counts, total + value, count + 1)
+
+    def get(self, **labels: str) -> float:
+        """:return: Количество наблюдений"""
+        observation = self._observations.get(tuple(sorted(labels.items())))
+        return observation[2] if observation else 0
+
+    def render(self) -> list[str]:
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        for labels, (counts, total, count) in self._observations.items():
+            for bucket, bucket_count in zip(self.buckets, counts):
+                bucket_labels = (*labels, ('le', str(bucket)))
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(bucket_labels)} {bucket_count}'
+                )
+            inf_labels = (*labels, ('le', '+Inf'))
+            lines.append(f'{self.name}_bucket{_format_labels(inf_labels)} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+
+        return lines
+
+
+@dataclasses.dataclass
+class Registry:
+    _metrics: dict[str, Metric] = dataclasses.field(default_factory=dict, init=False)
+    # Обновляют метрики-снимки (например, занятость пула) перед выдачей
+    _collectors: list[typing.Callable[[], None]] = dataclasses.field(
+        default_factory=list, init=False
+    )
+
+    def _get_or_create(
+        self, metric_class: type[Metric], name: str, description: str
+    ) -> Metric:
+        if name not in self._metrics:
+            self._metrics[name] = metric_class(name=name, description=description)
+
+        return self._metrics[name]
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str) -> Histogram:
+        return self._get_or_create(Histogram, name, description)
+
+    def add_collector(self, collector: typing.Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,294 @@
+import asyncio
+import dataclasses
+import logging
+import time
+import typing
+
+from telegram import Bot, InputMediaPhoto, Message
+from telegram.error import (
+    BadRequest,
+    Forbidden,
+    NetworkError,
+    RetryAfter,
+    TelegramError,
+)
+from telegram.request import HTTPXRequest
+
+from src import context
+from src.clients.rate_limit import get_keyed_rate_limiter, get_rate_limiter
+from src.config import Config
+
+log = logging.getLogger(__name__)
+
+# Ключ общих лимитов телеграма, при RATE_LIMIT_SHARED они делятся через Redis
+# между всеми процессами с рассылкой (jobs.py и воркеры listener.py)
+TELEGRAM_API_HOST = 'api.telegram.org'
+
+
+class TransientSendError(Exception):
+    """
+    Сообщение не отправлено из-за временной ошибки (flood control, сеть),
+    отправку можно повторить позже
+    """
+
+
+@dataclasses.dataclass
+class MediaItem:
+    photo: str | None
+    caption: str
+    photo_fallback: str | None = None
+
+
+@dataclasses.dataclass
+class Notification:
+    chat_id: str | int
+    text: str
+    photo: str | None = None
+    # URL постера, если телеграм отклонит устаревший file_id в photo
+    photo_fallback: str | None = None
+    # Альбом из нескольких постеров (send_media_group), text не используется
+    media: list[MediaItem] | None = None
+
+
+@dataclasses.dataclass
+class BroadcastStats:
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    started_at: float = dataclasses.field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Сообщений в секунду"""
+        return self.sent / self.duration if self.duration else 0.0
+
+
+def _report_message(sent: bool) -> None:
+    report = context.job_report.get()
+    if not report:
+        return
+
+    if sent:
+        report.messages_sent += 1
+    else:
+        report.messages_failed += 1
+
+
+class TelegramBroadcaster:
+    """
+    Один Bot и пул HTTP соединений на процесс.
+    Отправляет с ограничением конкурентности, общего и поканального rate limit
+    и ждет RetryAfter, который вернул телеграм
+    """
+
+    def __init__(
+        self,
+        token: str,
+        concurrency: int = Config.TELEGRAM_BROADCAST_CONCURRENCY,
+        global_rate: float = Config.TELEGRAM_GLOBAL_RPS,
+        per_chat_rate: float = Config.TELEGRAM_PER_CHAT_RPS,
+        max_retries: int = 3,
+    ) -> None:
+        self._token = token
+        self._concurrency = concurrency
+        self._global_limiter = get_rate_limiter(TELEGRAM_API_HOST, rate=global_rate)
+        self._chat_limiter = get_keyed_rate_limiter(
+            f'{TELEGRAM_API_HOST}:chat', rate=per_chat_rate
+        )
+        self._max_retries = max_retries
+        self._paused_until = 0.0
+        self._bot: Bot | None = None
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def bot(self) -> Bot:
+        if self._bot is None:
+            raise RuntimeError('Broadcaster is not started')
+        return self._bot
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self._bot is not None:
+                return
+
+            bot = Bot(
+                self._token,
+                request=HTTPXRequest(connection_pool_size=self._concurrency),
+            )
+            await bot.initialize()
+            self._bot = bot
+
+    async def stop(self) -> None:
+        if self._bot is None:
+            return
+
+        await self._bot.shutdown()
+        self._bot = None
+
+    async def _wait_for_flood_control(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _send_media_group(self, notification: Notification) -> Message:
+        def _build_media() -> list[InputMediaPhoto]:
+            return [
+                InputMediaPhoto(media=item.photo, caption=item.caption)
+                for item in notification.media
+            ]
+
+        try:
+            messages = await self.bot.send_media_group(
+                chat_id=notification.chat_id, media=_build_media()
+            )
+        except BadRequest:
+            if not any(
+                item.photo_fallback and item.photo_fallback != item.photo
+                for item in notification.media
+            ):
+                raise
+
+            log.warning(
+                'Media group rejected, fallback to urls chat_id=%s',
+                notification.chat_id,
+            )
+            for item in notification.media:
+                item.photo = item.photo_fallback or item.photo
+
+            messages = await self.bot.send_media_group(
+                chat_id=notification.chat_id, media=_build_media()
+            )
+
+        return messages[0]
+
+    async def _send(self, notification: Notification) -> Message:
+        if notification.media:
+            return await self._send_media_group(notification)
+
+        if notification.photo:
+            try:
+                return await self.bot.send_photo(
+                    chat_id=notification.chat_id,
+                    photo=notification.photo,
+                    caption=notification.text,
+                )
+            except BadRequest:
+                if (
+                    not notification.photo_fallback
+                    or notification.photo_fallback == notification.photo
+                ):
+                    raise
+
+                log.warning(
+                    'Photo rejected, fallback to url chat_id=%s', notification.chat_id
+                )
+                notification.photo = notification.photo_fallback
+                return await self.bot.send_photo(
+                    chat_id=notification.chat_id,
+                    photo=notification.photo,
+                    caption=notification.text,
+                )
+
+        return await self.bot.send_message(
+            chat_id=notification.chat_id, text=notification.text
+        )
+
+    async def send(
+        self,
+        notification: Notification,
+        stats: BroadcastStats | None = None,
+        raise_on_transient: bool = False,
+    ) -> Message | None:
+        """
+        :param raise_on_transient: Бросать TransientSendError, если сообщение
+            не отправлено из-за временной ошибки, а не только из-за отказа
+            телеграма (Forbidden, BadRequest)
+        :return: Отправленное сообщение или None
+        """
+        await self.start()
+        transient = True
+
+        for attempt in range(self._max_retries + 1):
+            await self._chat_limiter.acquire(str(notification.chat_id))
+            await self._wait_for_flood_control()
+            await self._global_limiter.acquire()
+
+            try:
+                message = await self._send(notification)
+            except RetryAfter as e:
+                # Flood control действует на весь бот, поэтому останавливаем все отправки
+                log.warning('Telegram flood control, retry after %s s', e.retry_after)
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + e.retry_after
+                )
+            except Forbidden:
+                log.info('Bot was blocked by user chat_id=%s', notification.chat_id)
+                transient = False
+                break
+            except BadRequest:
+                log.exception('Bad request on send chat_id=%s', notification.chat_id)
+                transient = False
+                break
+            except NetworkError:
+                log.warning(
+                    'Network error on send chat_id=%s attempt=%s',
+                    notification.chat_id,
+                    attempt,
+                    exc_info=True,
+                )
+                await asyncio.sleep(2**attempt)
+            except TelegramError:
+                log.exception('Send error chat_id=%s', notification.chat_id)
+                break
+            else:
+                if stats:
+                    stats.sent += 1
+                _report_message(sent=True)
+                return message
+
+            if stats:
+                stats.retried += 1
+
+        if stats:
+            stats.failed += 1
+        _report_message(sent=False)
+
+        if transient and raise_on_transient:
+            raise TransientSendError(f'Send failed chat_id={notification.chat_id}')
+
+        return None
+
+    async def broadcast(
+        self,
+        notifications: typing.Iterable[Notification],
+        stats: BroadcastStats | None = None,
+    ) -> BroadcastStats:
+        stats = stats or BroadcastStats()
+        notifications = iter(notifications)
+
+        async def _worker() -> None:
+            for notification in notifications:
+                await self.send(notification, stats=stats)
+
+        await asyncio.gather(*[_worker() for _ in range(self._concurrency)])
+
+        stats.finished_at = time.monotonic()
+        log.info(
+            'Broadcast finished: sent=%s failed=%s retried=%s duration=%.2fs '
+            'throughput=%.1f msg/s',
+            stats.sent,
+            stats.failed,
+            stats.retried,
+            stats.duration,
+            stats.throughput,
+        )
+
+        return stats
+
+
+broadcaster = TelegramBroadcaster(token=Config.BOT_TOKEN)
@@ -0,0 +1,251 @@
+import collections
+import dataclasses
+import datetime
+import logging
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+
+from src.config import Config
+from src.db import models, Session
+from src.enums import DigestFormat
+from src.jobs.utils import chunked, map_as_completed
+from src.notifications import outbox, photos, windows
+from src.notifications.broadcast import (
+    MediaItem,
+    Notification,
+    TransientSendError,
+    broadcaster,
+)
+from src.notifications.recipients import iter_recipients
+
+log = logging.getLogger(__name__)
+
+# Ограничения телеграма
+MEDIA_GROUP_MAX_SIZE = 10
+MESSAGE_MAX_LENGTH = 4096
+
+
+def is_digest_enabled(digest_enabled: bool | None) -> bool:
+    if digest_enabled is None:
+        return Config.NOTIFICATION_DIGEST_ENABLED
+    return digest_enabled
+
+
+def build_digest(chat_id: str, items: list[MediaItem]) -> list[Notification]:
+    """
+    Объединяет уведомления пользователя в альбомы по 10 постеров
+    или в текстовые сообщения со ссылками
+    """
+    if len(items) == 1:
+        item = items[0]
+        return [
+            Notification(
+                chat_id=chat_id,
+                text=item.caption,
+                photo=item.photo,
+                photo_fallback=item.photo_fallback,
+            )
+        ]
+
+    notifications = []
+
+    if Config.NOTIFICATION_DIGEST_FORMAT == DigestFormat.album:
+        with_photo = [item for item in items if item.photo]
+        items = [item for item in items if not item.photo]
+
+        for album in chunked(with_photo, size=MEDIA_GROUP_MAX_SIZE):
+            # В альбоме должно быть минимум два элемента
+            if len(album) == 1:
+                items.extend(album)
+                continue
+
+            notifications.append(Notification(chat_id=chat_id, text='', media=album))
+
+    text = ''
+    for item in items:
+        if text and len(text) + len(item.caption) + 2 > MESSAGE_MAX_LENGTH:
+            notifications.append(Notification(chat_id=chat_id, text=text))
+            text = ''
+        text = f'{text}\n\n{item.caption}' if text else item.caption
+
+    if text:
+        notifications.append(Notification(chat_id=chat_id, text=text))
+
+    return notifications
+
+
+@dataclasses.dataclass
+class DigestCollector:
+    """
+    Собирает уведомления за один запуск задачи.
+    Пользователи с включенным дайджестом получают их одним альбомом/сообщением,
+    остальным постеры рассылаются как раньше, по одному на тайтл.
+    Пользователям в тихие часы уведомления откладываются через outbox
+    """
+
+    _entities: list[tuple[photos.PhotoEntity, str]] = dataclasses.field(
+        default_factory=list
+    )
+
+    def add(self, entity: photos.PhotoEntity, text: str) -> None:
+        self._entities.append((entity, text))
+
+    async def flush(self) -> None:
+        digests: dict[str, list[MediaItem]] = collections.defaultdict(list)
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        # Подписчики читаются пачками, без дайджеста рассылка идет сразу,
+        # в памяти остаются только уведомления для дайджестов
+        for entity, text in self._entities:
+            async for recipients in iter_recipients(entity):
+                chat_ids = []
+                deferred = []
+
+                for recipient in recipients:
+                    available_at = windows.get_available_at(recipient, now=now)
+
+                    if available_at:
+                        deferred.append((recipient.chat_id, available_at))
+                    elif is_digest_enabled(recipient.digest_enabled):
+                        digests[recipient.chat_id].append(
+                            MediaItem(
+                                photo=photos.get_photo(entity),
+                                caption=text,
+                                photo_fallback=entity.image_url,
+                            )
+                        )
+                    else:
+                        chat_ids.append(recipient.chat_id)
+
+                if deferred:
+                    await outbox.defer_messages(
+                        entity=entity, text=text, deferred=deferred
+                    )
+
+                if chat_ids:
+                    async with Session() as session:
+                        await photos.broadcast_photo(
+                            session=session, entity=entity, chat_ids=chat_ids, text=text
+                        )
+
+        await broadcaster.broadcast(
+            notification
+            for chat_id, items in digests.items()
+            for notification in build_digest(chat_id=chat_id, items=items)
+        )
+
+        self._entities.clear()
+
+
+async def deliver_digest(chat_id: str, outbox_ids: list[UUID]) -> None:
+    """
+    Доставляет отложенные сообщения одного пользователя дайджестом, как
+    DigestCollector. Дайджест доставляется целиком: после временной ошибки
+    повторяется весь, даже если часть альбомов/сообщений уже отправлена
+    """
+    claimed = await outbox.claim_messages(outbox_ids)
+
+    if not claimed:
+        return
+
+    items = [
+        MediaItem(
+            photo=photos.get_photo(entity) if entity else message.photo,
+            caption=message.text,
+            photo_fallback=message.photo,
+        )
+        for message, entity in claimed
+    ]
+    sent = []
+    transient = False
+
+    try:
+        for notification in build_digest(chat_id=chat_id, items=items):
+            sent.append(await broadcaster.send(notification, raise_on_transient=True))
+    except TransientSendError:
+        transient = True
+
+    await outbox.save_results(
+        [message for message, _ in claimed],
+        sent=not transient and all(sent),
+        transient=transient,
+    )
+
+
+async def deliver_deferred(batch_size: int = Config.OUTBOX_PUBLISH_BATCH_SIZE) -> int:
+    """
+    Доставляет без очереди сообщения, отложенные из-за тихих часов,
+    когда outbox выключен. Сообщения пользователей с дайджестом
+    из одной пачки объединяются, как при обычной рассылке
+
+    :return: Количество обработанных сообщений
+    """
+    delivered = 0
+    after = None
+
+    while True:
+        async with Session() as session:
+            query = (
+                select(
+                    models.NotificationOutbox.id,
+                    models.NotificationOutbox.created_at,
+                    models.NotificationOutbox.chat_id,
+                    models.User.digest_enabled,
+                )
+                .outerjoin(
+                    models.User,
+                    models.User.telegram_id == models.NotificationOutbox.chat_id,
+                )
+                .where(
+                    outbox.is_deliverable(datetime.datetime.now(datetime.timezone.utc))
+                )
+                .order_by(
+                    models.NotificationOutbox.created_at, models.NotificationOutbox.id
+                )
+                .limit(batch_size)
+            )
+            if after:
+                # Сообщения после временной ошибки возвращаются в pending
+                # с более поздним available_at, поэтому проходим таблицу один раз
+                query = query.where(
+                    tuple_(
+                        models.NotificationOutbox.created_at,
+                        models.NotificationOutbox.id,
+                    )
+                    > after
+                )
+            rows = (await session.execute(query)).all()
+
+        if not rows:
+            return delivered
+
+        after = (rows[-1].created_at, rows[-1].id)
+
+        outbox_ids_by_chat: dict[str, list[UUID]] = collections.defaultdict(list)
+        for row in rows:
+            outbox_ids_by_chat[row.chat_id].append(row.id)
+
+        digest_chat_ids = {
+            row.chat_id for row in rows if is_digest_enabled(row.digest_enabled)
+        }
+
+        async def _deliver(chat_id: str) -> None:
+            outbox_ids = outbox_ids_by_chat[chat_id]
+
+            if chat_id in digest_chat_ids and len(outbox_ids) > 1:
+                await deliver_digest(chat_id=chat_id, outbox_ids=outbox_ids)
+                return
+
+            for outbox_id in outbox_ids:
+                await outbox.deliver(outbox_id)
+
+        async for chat_id, _, error in map_as_completed(
+            _deliver,
+            list(outbox_ids_by_chat),
+            concurrency=Config.TELEGRAM_BROADCAST_CONCURRENCY,
+        ):
+            if error:
+                log.error('Ошибка при доставке chat_id=%s', chat_id, exc_info=error)
+
+        delivered += len(rows)
@@ -0,0 +1,320 @@
+import datetime
+import logging
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import Config
+from src.db import models, enums, Session
+from src.enums import SubscriptionType
+from src.jobs import report
+from src.notifications import photos, windows
+from src.notifications.broadcast import (
+    Notification,
+    TransientSendError,
+    broadcaster,
+)
+from src.notifications.recipients import iter_recipients
+from src.queues.publisher import publish_message
+
+log = logging.getLogger(__name__)
+
+EVENTS_EXCHANGE = 'events'
+NOTIFICATION_EVENT = 'notification'
+
+ENTITY_MODELS = {
+    SubscriptionType.anime: models.Anime,
+    SubscriptionType.manga: models.Manga,
+}
+
+
+def _get_entity_type(entity: photos.PhotoEntity) -> SubscriptionType:
+    return (
+        SubscriptionType.anime
+        if isinstance(entity, models.Anime)
+        else SubscriptionType.manga
+    )
+
+
+def _build_row(
+    entity: photos.PhotoEntity,
+    text: str,
+    chat_id: str,
+    available_at: datetime.datetime | None,
+) -> dict:
+    return {
+        'id': uuid4(),
+        'chat_id': str(chat_id),
+        'text': text,
+        'photo': entity.image_url,
+        'entity_type': _get_entity_type(entity),
+        'entity_id': entity.id,
+        'status': enums.OutboxStatus.pending,
+        'attempts': 0,
+        'available_at': available_at,
+    }
+
+
+async def add_messages(
+    session: AsyncSession, entity: photos.PhotoEntity, text: str
+) -> None:
+    """
+    Намерения отправить уведомление, по одному на подписчика.
+    Пишутся в транзакцию session, в которой изменяется entity.
+    Подписчикам в тихие часы сообщение откладывается до их окончания
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    async for recipients in iter_recipients(entity):
+        await session.execute(
+            insert(models.NotificationOutbox),
+            [
+                _build_row(
+                    entity=entity,
+                    text=text,
+                    chat_id=recipient.chat_id,
+                    available_at=windows.get_available_at(recipient, now=now),
+                )
+                for recipient in recipients
+            ],
+        )
+        report.increment('messages_queued', len(recipients))
+
+
+async def defer_messages(
+    entity: photos.PhotoEntity,
+    text: str,
+    deferred: list[tuple[str, datetime.datetime]],
+) -> None:
+    """
+    Откладывает уведомление подписчикам в тихие часы при прямой рассылке
+
+    :param deferred: Пары chat_id, время окончания тихих часов
+    """
+    async with Session() as session:
+        await session.execute(
+            insert(models.NotificationOutbox),
+            [
+                _build_row(
+                    entity=entity, text=text, chat_id=chat_id, available_at=available_at
+                )
+                for chat_id, available_at in deferred
+            ],
+        )
+        await session.commit()
+
+    report.increment('messages_queued', len(deferred))
+
+
+async def publish_pending(batch_size: int = Config.OUTBOX_PUBLISH_BATCH_SIZE) -> int:
+    """
+    Публикует в очередь events новые сообщения, опубликованные, но так и не
+    доставленные за OUTBOX_REDELIVER_AFTER (например, упал воркер),
+    и сообщения с истекшей арендой отправки
+
+    :return: Количество опубликованных сообщений
+    """
+    published = 0
+
+    while True:
+        async with Session() as session:
+            now = datetime.datetime.now(datetime.timezone.utc)
+            redeliver_at = now - datetime.timedelta(
+                seconds=Config.OUTBOX_REDELIVER_AFTER
+            )
+            query = (
+                select(models.NotificationOutbox)
+                .where(
+                    (
+                        (models.NotificationOutbox.status == enums.OutboxStatus.pending)
+                        & _is_available(now)
+                    )
+                    | (
+                        (
+                            models.NotificationOutbox.status
+                            == enums.OutboxStatus.published
+                        )
+                        & (models.NotificationOutbox.published_at < redeliver_at)
+                    )
+                    | _is_sending_expired(now)
+                )
+                .order_by(models.NotificationOutbox.created_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            messages = (await session.scalars(query)).all()
+
+            if not messages:
+                return published
+
+            for message in messages:
+                message.status = enums.OutboxStatus.published
+                message.published_at = datetime.datetime.now(datetime.timezone.utc)
+
+            # Статус фиксируется до публикации, иначе воркер может получить
+            # сообщение раньше коммита и пропустить заблокированную строку.
+            # Если публикация не удастся, сообщение переопубликуется по таймауту
+            await session.commit()
+
+        for message in messages:
+            await publish_message(
+                message={'type': NOTIFICATION_EVENT, 'outbox_id': str(message.id)},
+                exchange_name=EVENTS_EXCHANGE,
+            )
+
+        published += len(messages)
+
+
+def _is_available(now: datetime.datetime):
+    return models.NotificationOutbox.available_at.is_(None) | (
+        models.NotificationOutbox.available_at <= now
+    )
+
+
+def _is_sending_expired(now: datetime.datetime):
+    return (models.NotificationOutbox.status == enums.OutboxStatus.sending) & (
+        models.NotificationOutbox.sending_until < now
+    )
+
+
+def is_deliverable(now: datetime.datetime):
+    """
+    Условие на сообщения, которые можно доставлять: pending после тихих часов
+    и отправляемые, у которых истекла аренда
+    """
+    return (
+        (models.NotificationOutbox.status == enums.OutboxStatus.pending)
+        & _is_available(now)
+    ) | _is_sending_expired(now)
+
+
+async def claim_messages(
+    outbox_ids: list[UUID],
+) -> list[tuple[models.NotificationOutbox, photos.PhotoEntity | None]]:
+    """
+    Забирает сообщения в статус sending с арендой OUTBOX_SENDING_LEASE
+    отдельной короткой транзакцией. Уже доставленные и отправляемые другим
+    воркером пропускаются, поэтому повторная публикация
+    не приводит к повторной отправке
+
+    :return: Забранные сообщения и аниме/манга, чей постер отправляется
+    """
+    async with Session() as session:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        query = (
+            update(models.NotificationOutbox)
+            .where(
+                models.NotificationOutbox.id.in_(outbox_ids),
+                models.NotificationOutbox.status.in_(
+                    [enums.OutboxStatus.pending, enums.OutboxStatus.published]
+                )
+                | _is_sending_expired(now),
+            )
+            .values(
+                status=enums.OutboxStatus.sending,
+                sending_until=now
+                + datetime.timedelta(seconds=Config.OUTBOX_SENDING_LEASE),
+                attempts=models.NotificationOutbox.attempts + 1,
+            )
+            .returning(models.NotificationOutbox)
+        )
+        messages = (await session.scalars(query)).all()
+
+        claimed = []
+        for message in messages:
+            entity = None
+            if message.entity_type:
+                entity = await ENTITY_MODELS[message.entity_type].get_or_none(
+                    session=session, id=message.entity_id
+                )
+            claimed.append((message, entity))
+
+        await session.commit()
+
+    return claimed
+
+
+def _get_result_values(
+    message: models.NotificationOutbox, sent: bool, transient: bool
+) -> dict:
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    if sent:
+        return {
+            'status': enums.OutboxStatus.delivered,
+            'delivered_at': now,
+            'sending_until': None,
+        }
+
+    if transient and message.attempts < Config.OUTBOX_MAX_ATTEMPTS:
+        delay = Config.OUTBOX_RETRY_DELAY * 2 ** (message.attempts - 1)
+        log.warning('Outbox message %s not sent, retry in %s s', message.id, delay)
+        return {
+            'status': enums.OutboxStatus.pending,
+            'available_at': now + datetime.timedelta(seconds=delay),
+            'sending_until': None,
+        }
+
+    # Телеграм отказал окончательно (бот заблокирован, неверный запрос)
+    # или закончились попытки
+    return {'status': enums.OutboxStatus.failed, 'sending_until': None}
+
+
+async def save_results(
+    messages: list[models.NotificationOutbox], sent: bool, transient: bool
+) -> None:
+    """
+    Записывает результат отправки забранных сообщений второй короткой транзакцией.
+    После временной ошибки сообщение возвращается в pending с задержкой,
+    failed только при отказе телеграма или после OUTBOX_MAX_ATTEMPTS попыток
+
+    :param transient: Отправка не удалась из-за временной ошибки
+    """
+    async with Session() as session:
+        for message in messages:
+            await session.execute(
+                update(models.NotificationOutbox)
+                .where(
+                    models.NotificationOutbox.id == message.id,
+                    models.NotificationOutbox.status == enums.OutboxStatus.sending,
+                )
+                .values(**_get_result_values(message, sent=sent, transient=transient))
+            )
+        await session.commit()
+
+
+async def deliver(outbox_id: UUID) -> None:
+    """
+    Доставляет одно сообщение из outbox.
+    Отправка идет без транзакции и соединения с базой,
+    между claim_messages и save_results
+    """
+    claimed = await claim_messages([outbox_id])
+
+    if not claimed:
+        log.debug('Outbox message %s already processed', outbox_id)
+        return
+
+    message, entity = claimed[0]
+    transient = False
+
+    try:
+        sent = await broadcaster.send(
+            Notification(
+                chat_id=message.chat_id,
+                text=message.text,
+                photo=photos.get_photo(entity) if entity else message.photo,
+                photo_fallback=message.photo,
+            ),
+            raise_on_transient=True,
+        )
+    except TransientSendError:
+        sent = None
+        transient = True
+
+    await save_results([message], sent=bool(sent), transient=transient)
+
+    if sent and entity:
+        async with Session() as session:
+            await photos.save_file_id(session=session, entity=entity, message=sent)
@@ -0,0 +1,98 @@
+import logging
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from telegram import Message
+from telegram.error import BadRequest
+
+from src.db import models
+from src.notifications.broadcast import BroadcastStats, Notification, broadcaster
+
+log = logging.getLogger(__name__)
+
+PhotoEntity = models.Anime | models.Manga
+
+
+def get_photo(entity: PhotoEntity) -> str | None:
+    return entity.image_file_id or entity.image_url
+
+
+def get_file_id(message: Message | None) -> str | None:
+    if not message or not message.photo:
+        return None
+
+    # Самый большой размер, его file_id можно отправлять повторно
+    return message.photo[-1].file_id
+
+
+async def save_file_id(
+    session: AsyncSession, entity: PhotoEntity, message: Message | None
+) -> None:
+    file_id = get_file_id(message)
+
+    if not file_id or file_id == entity.image_file_id:
+        return
+
+    model = type(entity)
+    await session.execute(
+        update(model).where(model.id == entity.id).values(image_file_id=file_id)
+    )
+    await session.commit()
+
+    entity.image_file_id = file_id
+
+
+async def reply_photo(
+    message: Message, session: AsyncSession, entity: PhotoEntity, **kwargs
+) -> Message:
+    """
+    reply_photo с постером по file_id, при отказе телеграма повторяет по URL
+    """
+    try:
+        sent = await message.reply_photo(photo=get_photo(entity), **kwargs)
+    except BadRequest:
+        if not entity.image_file_id or not entity.image_url:
+            raise
+
+        log.warning('Photo file_id rejected entity_id=%s', entity.id)
+        sent = await message.reply_photo(photo=entity.image_url, **kwargs)
+
+    await save_file_id(session=session, entity=entity, message=sent)
+
+    return sent
+
+
+async def broadcast_photo(
+    session: AsyncSession,
+    entity: PhotoEntity,
+    chat_ids: list[str],
+    text: str,
+) -> BroadcastStats:
+    """
+    Рассылает постер entity подписчикам.
+    Первые сообщения уходят по одному, пока телеграм не вернет file_id,
+    остальные отправляются уже с ним
+    """
+    notifications = [
+        Notification(
+            chat_id=chat_id,
+            text=text,
+            photo=get_photo(entity),
+            photo_fallback=entity.image_url,
+        )
+        for chat_id in chat_ids
+    ]
+
+    stats = BroadcastStats()
+
+    while notifications and get_photo(entity):
+        sent = await broadcaster.send(notifications.pop(0), stats=stats)
+
+        if get_file_id(sent):
+            await save_file_id(session=session, entity=entity, message=sent)
+            break
+
+    for notification in notifications:
+        notification.photo = get_photo(entity)
+
+    return await broadcaster.broadcast(notifications, stats=stats)
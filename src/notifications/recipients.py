@@ -0,0 +1,65 @@
+import datetime
+import typing
+
+from sqlalchemy import select
+
+from src.config import Config
+from src.db import models, Session
+
+
+class Recipient(typing.NamedTuple):
+    chat_id: str
+    # None - используются глобальные настройки
+    digest_enabled: bool | None
+    timezone: str | None
+    quiet_hours_start: datetime.time | None
+    quiet_hours_end: datetime.time | None
+
+
+async def iter_recipients(
+    entity: models.Anime | models.Manga,
+    chunk_size: int = Config.SUBSCRIBERS_CHUNK_SIZE,
+) -> typing.AsyncIterator[list[Recipient]]:
+    """
+    Подписчики аниме/манги пачками с пагинацией по id подписки.
+    Каждая пачка читается отдельной короткой сессией, поэтому пока вызывающий
+    рассылает пачку, соединение и транзакция не удерживаются,
+    в памяти держится не больше одной пачки
+    """
+    if isinstance(entity, models.Anime):
+        subscription_model = models.Subscription
+        where = models.Subscription.anime_id == entity.id
+    else:
+        subscription_model = models.SubscriptionManga
+        where = models.SubscriptionManga.manga_id == entity.id
+
+    query = (
+        select(
+            subscription_model.id,
+            models.User.telegram_id,
+            models.User.digest_enabled,
+            models.User.timezone,
+            models.User.quiet_hours_start,
+            models.User.quiet_hours_end,
+        )
+        .join(subscription_model, subscription_model.user_id == models.User.id)
+        .where(where)
+        .order_by(subscription_model.id)
+        .limit(chunk_size)
+    )
+    last_id = 0
+
+    while True:
+        async with Session() as session:
+            rows = (
+                await session.execute(query.where(subscription_model.id > last_id))
+            ).all()
+
+        if not rows:
+            return
+
+        last_id = rows[-1][0]
+        yield [Recipient(*row[1:]) for row in rows]
+
+        if len(rows) < chunk_size:
+            return
@@ -0,0 +1,60 @@
+import datetime
+import zoneinfo
+
+from src.config import Config
+from src.notifications.recipients import Recipient
+
+
+def get_timezone(name: str | None) -> datetime.tzinfo:
+    name = name or Config.NOTIFICATION_TIMEZONE
+
+    if not name:
+        # Часовой пояс сервера
+        return datetime.datetime.now().astimezone().tzinfo
+
+    return zoneinfo.ZoneInfo(name)
+
+
+def is_quiet_time(
+    time: datetime.time, start: datetime.time, end: datetime.time
+) -> bool:
+    if start == end:
+        return False
+
+    if start < end:
+        return start <= time < end
+
+    # Тихие часы через полночь, например 23:00-09:00
+    return time >= start or time < end
+
+
+def get_available_at(
+    recipient: Recipient, now: datetime.datetime
+) -> datetime.datetime | None:
+    """
+    Когда пользователю можно отправить уведомление по его часовому поясу
+    и тихим часам
+
+    :param now: Текущее время с часовым поясом
+    :return: None, если можно отправлять сейчас
+    """
+    start, end = recipient.quiet_hours_start, recipient.quiet_hours_end
+
+    if start is None or end is None:
+        start, end = Config.QUIET_HOURS_START, Config.QUIET_HOURS_END
+
+    if start is None or end is None:
+        return None
+
+    local_now = now.astimezone(get_timezone(recipient.timezone))
+
+    if not is_quiet_time(local_now.time(), start, end):
+        return None
+
+    available_at = datetime.datetime.combine(
+        local_now.date(), end, tzinfo=local_now.tzinfo
+    )
+    if available_at <= local_now:
+        available_at += datetime.timedelta(days=1)
+
+    return available_at
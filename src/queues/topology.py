@@ -6,6 +6,7 @@ from aio_pika.abc import AbstractExchange
 from aio_pika.abc import AbstractQueue
 
 from src import context
+from src.config import Config
 from src.queues.connection import RabbitmqClient
 
 DLX_NAME = 'DLX'
@@ -46,6 +47,7 @@ async def declare_rabbitry_queue(
     declare_dlx_unknown_queue: bool = False,
     declare_dlx_exchange: bool = False,
     queue_exchange_durable: bool = True,
+    prefetch_count: int = 0,
 ) -> Tuple[AbstractQueue, AbstractExchange]:
     if declare_dlx_unknown_queue:
         await _declare_dlx_unknown_queue(rabbitmq_client)
@@ -54,6 +56,7 @@ async def declare_rabbitry_queue(
 
     queue = await rabbitmq_client.declare_queue(
         queue_name=queue_name,
+        prefetch_count=prefetch_count,
         durable=True,
         arguments={
             'x-dead-letter-exchange': DLX_NAME,
@@ -105,6 +108,9 @@ async def build_queues() -> dict:
             declare_dlx_exchange=True,
             declare_dlx_unknown_queue=True,
             rabbitmq_client=rabbitmq_client,
+            # Одновременно обрабатывается не больше сообщений, чем может отправлять
+            # broadcaster, остальные остаются в очереди для других воркеров
+            prefetch_count=Config.TELEGRAM_BROADCAST_CONCURRENCY,
         )
         queues[queue_name] = queue
 
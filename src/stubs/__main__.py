@@ -0,0 +1,46 @@
+"""
+Заглушки Shikimori, MangaUpdates и exchangerate-api на одном порту.
+
+    python -m src.stubs --port 8090 --latency 0.1 --error-rate 0.05
+
+В .env для работы с заглушками:
+
+    SHIKIMORI_URL=http://localhost:8090/api/graphql
+    MANGA_UPDATES_URL=http://localhost:8090/
+    CURRENCY_EXCHANGE_URL=http://localhost:8090/v6/
+"""
+
+import argparse
+
+from aiohttp import web
+
+from src.stubs.server import StubSettings, build_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Заглушки внешних API')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--latency-jitter', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--search-results', type=int, default=10)
+    parser.add_argument('--episode-interval', type=float, default=60 * 60)
+    parser.add_argument('--chapter-interval', type=float, default=60 * 60)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    settings = StubSettings(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        search_results=args.search_results,
+        episode_interval=args.episode_interval,
+        chapter_interval=args.chapter_interval,
+        seed=args.seed,
+    )
+    web.run_app(build_app(settings), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import asyncio
+import dataclasses
+import datetime
+import hashlib
+import json
+import random
+import time
+import typing
+
+from aiohttp import web
+from graphql import FieldNode, SelectionSetNode, parse
+
+from src.enums import Currency
+
+
+@dataclasses.dataclass
+class StubSettings:
+    """
+    Поведение заглушек внешних API для нагрузочных тестов и бенчмарков
+    """
+
+    # Задержка ответа в секундах и случайная добавка к ней
+    latency: float = 0
+    latency_jitter: float = 0
+    # Доля ответов 503
+    error_rate: float = 0
+    # Сколько тайтлов отдает поиск
+    search_results: int = 10
+    # Как часто выходят новые серии аниме и главы манги, в секундах
+    episode_interval: float = 60 * 60
+    chapter_interval: float = 60 * 60
+    seed: int | None = None
+
+
+def _get_number(value: str | int, modulo: int) -> int:
+    """Детерминированное число из id, чтобы данные не менялись между запросами"""
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return int(digest, 16) % modulo
+
+
+def _get_released(started_at: float, interval: float, base: int) -> int:
+    return base + int((time.time() - started_at) / interval)
+
+
+def _build_anime(
+    anime_id: int, settings: StubSettings, started_at: float, name: str = None
+) -> dict:
+    episodes_aired = _get_released(
+        started_at, settings.episode_interval, base=_get_number(anime_id, 12)
+    )
+    next_episode_in = settings.episode_interval - (
+        (time.time() - started_at) % settings.episode_interval
+    )
+    next_episode_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        seconds=next_episode_in
+    )
+
+    return {
+        'id': str(anime_id),
+        'name': name or f'Anime {anime_id}',
+        'russian': f'Аниме {anime_id}',
+        'url': f'https://shikimori.one/animes/{anime_id}',
+        'episodes': 0,
+        'episodesAired': episodes_aired,
+        'nextEpisodeAt': next_episode_at.isoformat(),
+        'status': 'ongoing',
+        'airedOn': {'year': 2000 + _get_number(anime_id, 26)},
+        'poster': {
+            'id': str(anime_id),
+            'originalUrl': f'https://shikimori.one/posters/{anime_id}.jpg',
+            'mainUrl': f'https://shikimori.one/posters/{anime_id}.jpg',
+        },
+    }
+
+
+def _project(data: typing.Any, selection_set: SelectionSetNode | None) -> typing.Any:
+    """Оставляет только запрошенные поля, как настоящий GraphQL"""
+    if selection_set is None or data is None:
+        return data
+
+    if isinstance(data, list):
+        return [_project(item, selection_set) for item in data]
+
+    return {
+        field.name.value: _project(data.get(field.name.value), field.selection_set)
+        for field in selection_set.selections
+        if isinstance(field, FieldNode)
+    }
+
+
+def _build_series(series_id: int, settings: StubSettings, started_at: float) -> dict:
+    return {
+        'series_id': series_id,
+        'title': f'Manga {series_id}',
+        'url': f'https://www.mangaupdates.com/series/{series_id}',
+        'year': str(2000 + _get_number(series_id, 26)),
+        'image': {
+            'url': {'original': f'https://cdn.mangaupdates.com/image/{series_id}.jpg'}
+        },
+        'latest_chapter': _get_released(
+            started_at, settings.chapter_interval, base=_get_number(series_id, 200)
+        ),
+        'completed': False,
+    }
+
+
+def build_app(settings: StubSettings | None = None) -> web.Application:
+    settings = settings or StubSettings()
+    started_at = time.time()
+    rand = random.Random(settings.seed)
+
+    @web.middleware
+    async def behaviour_middleware(request: web.Request, handler):
+        delay = settings.latency + rand.uniform(0, settings.latency_jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if rand.random() < settings.error_rate:
+            return web.Response(status=503, text='Stub error')
+
+        return await handler(request)
+
+    async def shikimori_graphql(request: web.Request) -> web.Response:
+        payload = await request.json()
+        variables = payload.get('variables') or {}
+        document = parse(payload['query'])
+        animes_field = next(
+            field
+            for field in document.definitions[0].selection_set.selections
+            if field.name.value == 'animes'
+        )
+
+        limit = variables.get('limit') or 1
+        if variables.get('ids'):
+            animes = [
+                _build_anime(int(anime_id), settings, started_at)
+                for anime_id in variables['ids'].split(',')[:limit]
+            ]
+        else:
+            search = variables.get('search') or ''
+            animes = [
+                _build_anime(
+                    _get_number(f'{search}:{index}', 100_000),
+                    settings,
+                    started_at,
+                    name=f'{search} {index}',
+                )
+                for index in range(min(limit, settings.search_results))
+            ]
+
+        return web.json_response(
+            {'data': {'animes': _project(animes, animes_field.selection_set)}}
+        )
+
+    async def manga_series(request: web.Request) -> web.Response:
+        series = _build_series(
+            int(request.match_info['series_id']), settings, started_at
+        )
+
+        # ETag меняется с выходом главы, как и у MangaUpdates
+        etag = f'"{series["series_id"]}-{series["latest_chapter"]}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+
+        return web.json_response(series, headers={'ETag': etag})
+
+    async def manga_search(request: web.Request) -> web.Response:
+        search = (await request.json()).get('search') or ''
+        results = [
+            {
+                'record': _build_series(
+                    _get_number(f'{search}:{index}', 100_000), settings, started_at
+                )
+            }
+            for index in range(settings.search_results)
+        ]
+
+        return web.json_response({'results': results})
+
+    async def currency_latest(request: web.Request) -> web.Response:
+        base_code = request.match_info['currency']
+        if base_code not in Currency:
+            return web.json_response(
+                {'result': 'error', 'error-type': 'unsupported-code'}
+            )
+
+        now = int(time.time())
+        rates = {
+            currency.value: 1
+            if currency == base_code
+            else round(1 + _get_number(f'{base_code}:{currency}', 10_000) / 100, 4)
+            for currency in Currency
+        }
+
+        return web.Response(
+            text=json.dumps(
+                {
+                    'result': 'success',
+                    'time_last_update_unix': now - now % (60 * 60 * 24),
+                    'time_next_update_unix': now - now % (60 * 60 * 24) + 60 * 60 * 24,
+                    'base_code': base_code,
+                    'conversion_rates': rates,
+                }
+            ),
+            content_type='application/json',
+        )
+
+    app = web.Application(middlewares=[behaviour_middleware])
+    app.router.add_post('/api/graphql', shikimori_graphql)
+    app.router.add_get('/v1/series/{series_id}', manga_series)
+    app.router.add_post('/v1/series/search', manga_search)
+    app.router.add_get('/v6/{api_key}/latest/{currency}', currency_latest)
+
+    return app